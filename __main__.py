@@ -0,0 +1,4 @@
+from bot import run_bot
+
+# `python path/to/vk-bot --no-delay` runs the bot the same as `python bot.py --no-delay`
+run_bot()
@@ -0,0 +1,57 @@
+"""
+Wall-clock time of one group walls collection with simulated network latency
+
+The request interval and the latency are scaled down so a run takes seconds;
+their ratio matches a real cycle (3 s between requests, about 1 s per
+response). 'blind sleeps' pauses the full interval before every request, as
+the bot used to; the token bucket only waits for what is left of it.
+
+Run from the repository root:
+    python benchmarks/bench_collection.py [-n 3]
+
+"""
+import time
+
+from harness import main
+from offline_bot import OfflineBot
+
+import bot as bot_module
+from pacer import TokenBucket
+from post_store import PostStore
+
+INTERVAL = 0.3
+LATENCY = 0.1
+GROUPS = ['https://vk.com/group%d' % i for i in range(8)]
+
+
+class LatencyBot(OfflineBot):
+
+    def _fixture_response(self, url):
+        time.sleep(LATENCY)
+        return super()._fixture_response(url)
+
+
+class BlindSleep:
+
+    def acquire(self):
+        time.sleep(INTERVAL)
+        return INTERVAL
+
+
+def collect(blind_sleeps=False):
+    bot = LatencyBot(post_store=PostStore(':memory:'))
+    bot._pacer = BlindSleep() if blind_sleeps else TokenBucket(1 / INTERVAL)
+    bot._crawl_groups()
+    return bot.requests_made
+
+
+def build_cases():
+    bot_module.groups = GROUPS
+    return [
+        ('blind sleeps', lambda: collect(blind_sleeps=True)),
+        ('token bucket', lambda: collect()),
+    ]
+
+
+if __name__ == '__main__':
+    main(build_cases(), 'group walls collection with simulated latency', number=3)
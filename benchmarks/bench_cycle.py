@@ -0,0 +1,126 @@
+"""
+End-to-end cycles of the bot against the local stand-in server
+
+The bot starts logged out, logs in through the stand-in login.vk.com and
+then runs cycle_bot over and over. A simulated clock jumps straight to
+the next due action, and the bot's own sleeps (request pacing, retry
+backoff) are scaled down, while every answer of the server still takes
+--latency seconds. Reports cycles per second and, per action, the
+requests it made and the CPU time the bot spent on it (the server's CPU
+time is left out). The bot's last repost is made to look old, as in
+soak_cycles, so the repost actions go the whole way: the group and bot
+walls are crawled, the candidates scored and the post published through
+like.php. With --recent-repost the post of today on the bot's own wall
+in the fixtures counts, and the repost actions stop after their age
+check. The repost actions run seldom in a schedule, so after the cycles
+each of them is also run --reposts times in a row and reported apart.
+
+Run from the repository root:
+    python benchmarks/bench_cycle.py [--cycles 200] [--latency 0.01] [--reposts 10] [--recent-repost]
+
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from stub_server import LocalBot, StubVkServer
+
+from bot import cycle_bot
+from scheduler import ActionScheduler
+
+
+def scale_sleep(scale):
+    sleep = time.sleep
+    time.sleep = lambda seconds: sleep(seconds * scale)
+
+
+def measure(stats, name, server, run):
+    """
+    Run one cycle or action and add what it cost to stats[name]
+    :param stats: dict
+    :param name: str
+    :param server: StubVkServer
+    :param run: callable returning the list of (action name, result)
+    :return: list of (action name, result)
+
+    """
+    requests, cpu, server_cpu = server.requests, time.process_time(), server.cpu
+    started = time.perf_counter()
+    results = run()
+    stat = stats.setdefault(name or '+'.join(action for action, _ in results) or '(none due)',
+                            {'runs': 0, 'ok': 0, 'requests': 0, 'cpu': 0.0, 'wall': 0.0})
+    stat['runs'] += 1
+    stat['ok'] += all(result for _, result in results)
+    stat['requests'] += server.requests - requests
+    stat['cpu'] += (time.process_time() - cpu) - (server.cpu - server_cpu)
+    stat['wall'] += time.perf_counter() - started
+    return results
+
+
+def print_stats(stats):
+    print('%-40s %6s %6s %10s %12s %12s' % ('action', 'runs', 'ok', 'req/run', 'cpu ms/run', 'wall ms/run'))
+    for name, stat in sorted(stats.items(), key=lambda item: -item[1]['runs']):
+        runs = stat['runs']
+        print('%-40s %6d %6d %10.1f %12.2f %12.2f' % (
+            name, runs, stat['ok'], stat['requests'] / runs, stat['cpu'] / runs * 1000, stat['wall'] / runs * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='end-to-end bot cycles')
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds every answer of the server takes')
+    parser.add_argument('--sleep-scale', type=float, default=0.001, help='factor of the bot sleeps')
+    parser.add_argument('--reposts', type=int, default=10, help='runs of every repost action after the cycles')
+    parser.add_argument('--recent-repost', action='store_true',
+                        help='keep the repost of today on the bot wall, the repost actions stop at the age check')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='vk_bot_cycle_'))
+    scale_sleep(args.sleep_scale)
+    server = StubVkServer(latency=args.latency, require_login=True).start()
+    bot = LocalBot(server)
+    # the pacer refills in real time, so its rate is scaled up as its sleeps are scaled down
+    bot._pacer.rate /= args.sleep_scale
+    if not args.recent_repost:
+        # every repost cycle goes past the age check and crawls the walls
+        bot._get_bot_last_post_age = lambda: 0
+    scheduler = ActionScheduler(bot.get_action_policies())
+
+    actions = {}
+    reposts = {}
+    now = time.time()
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        started = time.perf_counter()
+        for _ in range(args.cycles):
+            now += scheduler.next_delay(now)
+            measure(actions, None, server, lambda: cycle_bot(scheduler, bot, now))
+        elapsed = time.perf_counter() - started
+        requests = server.requests
+
+        for name, method in ((bot.ACTION_REPOST_RANDOM, bot.repost_random_post),
+                             (bot.ACTION_REPOST_OUR, bot.repost_our_post)):
+            for _ in range(args.reposts):
+                bot.clear_page_cache()
+                measure(reposts, name, server, lambda: [(name, method())])
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        bot.close()
+        server.stop()
+
+    print('%d cycles in %.2f s, %.1f cycles/s, %d requests, %d logins, server latency %.0f ms' % (
+        args.cycles, elapsed, args.cycles / elapsed, requests, server.logins, args.latency * 1000))
+    print_stats(actions)
+    if reposts:
+        print()
+        print('repost actions, %d runs each in a row%s' % (
+            args.reposts, ', stopped at the age check' if args.recent_repost else ''))
+        print_stats(reposts)
+
+
+if __name__ == '__main__':
+    main()
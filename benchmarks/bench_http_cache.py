@@ -0,0 +1,52 @@
+"""
+Group walls through the conditional-GET disk cache against downloading
+them every time, over HTTP from the local stand-in server
+
+Every case crawls the walls of vk_groups.groups the way _crawl_groups
+reads them. The server sends an ETag with every page, as a static server
+would; vk.com itself may not, then only the TTL part applies.
+
+Run from the repository root:
+    python benchmarks/bench_http_cache.py [-n 10]
+
+"""
+import os
+import tempfile
+
+from harness import main
+from stub_server import LocalBot, StubVkServer
+
+from http_cache import HttpCache
+from vk_groups import groups
+
+
+def crawl(bot):
+    return sum(len(soup.select('.wall_posts .post')) for _, soup in bot._fetch_walls(groups))
+
+
+def build_cases(server):
+    directory = tempfile.mkdtemp(prefix='vk_bot_http_cache_')
+    os.chdir(directory)
+    plain = LocalBot(server)
+    fresh = LocalBot(server, http_cache=HttpCache(os.path.join(directory, 'fresh'), ttl=3600))
+    stale = LocalBot(server, http_cache=HttpCache(os.path.join(directory, 'stale'), ttl=0))
+    stale_unparsed = LocalBot(server, http_cache=HttpCache(os.path.join(directory, 'stale_unparsed'),
+                                                           ttl=0, documents=0))
+    for bot in (plain, fresh, stale, stale_unparsed):
+        bot._pacer.rate = 1e9
+
+    return [
+        ('no cache: download + parse', lambda: crawl(plain)),
+        ('fresh: no request, no parse', lambda: crawl(fresh)),
+        ('stale: 304 revalidation, no parse', lambda: crawl(stale)),
+        ('stale, documents not kept: 304 + parse', lambda: crawl(stale_unparsed)),
+    ]
+
+
+if __name__ == '__main__':
+    server = StubVkServer().start()
+    try:
+        main(build_cases(server), __doc__, number=10)
+        print('%d requests, %d answered 304 Not Modified' % (server.requests, server.not_modified))
+    finally:
+        server.stop()
@@ -0,0 +1,43 @@
+"""
+Cost of one log call on the bot's side: the old open-append-print write
+against Logger, which only queues the record for its writer thread
+
+Run from the repository root:
+    python benchmarks/bench_logger.py [-n 2000]
+
+"""
+import os
+import tempfile
+from time import gmtime, strftime
+
+from harness import main
+
+from logger import DEBUG, Logger
+
+MESSAGE = 'a post -12345_678 reposted successfully'
+
+
+def legacy_log(path, msg):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    now = strftime("%Y-%m-%d %H:%M:%S", gmtime())
+    msg = now + ': ' + msg.encode().decode("utf-8") + '\r\n'
+    with open(path, 'a') as f:
+        f.write(msg)
+
+
+def build_cases():
+    directory = tempfile.mkdtemp(prefix='vk_bot_log_')
+    legacy_path = os.path.join(directory, 'tmp', 'legacy_log.out')
+    logger = Logger(path=os.path.join(directory, 'tmp', 'bot_log.out'),
+                    crash_path=os.path.join(directory, 'tmp', 'crash_log.out'), console=False)
+    logger.log('start')
+
+    return [
+        ('legacy: makedirs + open + append', lambda: legacy_log(legacy_path, MESSAGE)),
+        ('Logger.log', lambda: logger.log(MESSAGE)),
+        ('Logger.log below the level', lambda: logger.log(MESSAGE, DEBUG)),
+    ]
+
+
+if __name__ == '__main__':
+    main(build_cases(), __doc__, number=2000)
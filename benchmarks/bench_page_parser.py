@@ -0,0 +1,37 @@
+"""
+Parse time of the saved pages for every available parser backend and scope
+
+Run from the repository root:
+    python benchmarks/bench_page_parser.py [-n 50]
+
+"""
+from bs4 import BeautifulSoup
+
+from harness import load_fixture, main
+
+import page_parser
+from page_parser import SCOPE_COUNTERS, SCOPE_WALL, parse_page
+
+
+def build_cases():
+    pages = {
+        'group_wall.html': [SCOPE_WALL],
+        'profile_wall.html': [SCOPE_WALL, SCOPE_COUNTERS],
+        'login.html': [],
+    }
+    backends = ['html.parser']
+    if page_parser.PARSER_BACKEND != 'html.parser':
+        backends.append(page_parser.PARSER_BACKEND)
+
+    cases = []
+    for name, scopes in pages.items():
+        markup = load_fixture(name)
+        for backend in backends:
+            cases.append(('%s %s full' % (name, backend), lambda m=markup, b=backend: BeautifulSoup(m, b)))
+        for scope in scopes:
+            cases.append(('%s parse_page %s' % (name, scope), lambda m=markup, s=scope: parse_page(m, s)))
+    return cases
+
+
+if __name__ == '__main__':
+    main(build_cases(), 'page_parser backends and scopes on the fixture corpus')
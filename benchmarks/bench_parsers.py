@@ -0,0 +1,74 @@
+"""
+Microbenchmarks for the wall/profile parsers of SkynetBot
+
+Run from the repository root:
+    python benchmarks/bench_parsers.py [-n 100] [-k wall_post]
+
+"""
+from harness import load_fixture, main
+from offline_bot import OfflineBot, disable_sleep
+
+from page_parser import SCOPE_WALL, parse_page
+from post_record import build_reposted_index
+
+
+def build_cases():
+    disable_sleep()
+    bot = OfflineBot()
+
+    group_wall = load_fixture('group_wall.html')
+    profile_wall = load_fixture('profile_wall.html')
+    login_page = load_fixture('login.html')
+
+    group_posts = parse_page(group_wall, SCOPE_WALL).select('.post.own')
+    profile_posts = parse_page(profile_wall, SCOPE_WALL).select('.wall_posts .post.own')
+    counters = [
+        counter.getText()
+        for post in group_posts
+        for counter in post.select('.post_like_count._count, .post_share_count._count, .post_views_count._count')
+    ]
+
+    profile_soup = parse_page(profile_wall)
+    login_soup = parse_page(login_page)
+
+    # a pool of the size a real cycle crawls: every group and bot wall a few times over
+    candidate_records = [bot._parse_wall_post(post) for post in group_posts] * 20
+    bot_records = [bot._parse_wall_post(post) for post in profile_posts] * 20
+
+    def filter_reposted():
+        reposted = build_reposted_index(bot_records)
+        return [post for post in candidate_records if post.key and post.key not in reposted]
+
+    def collect_stat():
+        bot.clear_page_cache()
+        return bot._collect_stat()
+
+    def parse_group_wall_posts():
+        return [bot._parse_wall_post(post) for post in group_posts]
+
+    def parse_profile_wall_posts():
+        return [bot._parse_wall_post(post) for post in profile_posts]
+
+    def parse_wall_post_dates():
+        return [bot._parse_wall_post_date(post) for post in group_posts]
+
+    def parse_human_numbers():
+        normalizer = bot._get_normalizer()
+        return [normalizer.parse_count(counter) for counter in counters]
+
+    return [
+        ('_parse_wall_post x%d (group)' % len(group_posts), parse_group_wall_posts),
+        ('_parse_wall_post x%d (profile)' % len(profile_posts), parse_profile_wall_posts),
+        ('_parse_wall_post_date x%d' % len(group_posts), parse_wall_post_dates),
+        ('parse_count x%d' % len(counters), parse_human_numbers),
+        ('last repost date (profile)',
+         lambda: bot._parse_wall_post_date(profile_soup.select_one('.post.own.post_copy'))),
+        ('_needs_login (login page)', lambda: bot._needs_login(login_soup)),
+        ('_needs_login (profile page)', lambda: bot._needs_login(profile_soup)),
+        ('_collect_stat (cold page cache)', collect_stat),
+        ('reposted filter %dx%d' % (len(candidate_records), len(bot_records)), filter_reposted),
+    ]
+
+
+if __name__ == '__main__':
+    main(build_cases(), 'SkynetBot parser microbenchmarks on the fixture corpus')
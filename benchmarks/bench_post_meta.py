@@ -0,0 +1,120 @@
+"""
+Post dates and counters: PostMetaNormalizer against the strptime/regex
+code of _parse_wall_post_date and _parse_int_from_human_number it replaced
+
+The corpus is every date and counter of the fixture walls, repeated the
+way a crawl of several groups sees them. Besides the timings the script
+prints how many strings made the old code raise and how many dates it
+got wrong ("сегодня" contains "год", so posts of today counted as a year
+old).
+
+Run from the repository root:
+    python benchmarks/bench_post_meta.py [-n 200]
+
+"""
+import datetime
+import re
+import time
+
+from harness import load_fixture, main
+
+from months import months
+from page_parser import SCOPE_WALL, parse_page
+from post_meta import PostMetaNormalizer
+
+REPEAT = 10
+
+
+def legacy_date(post_date):
+    """
+    :return: (timestamp, raised)
+
+    """
+    try:
+        if "год" in post_date or "года" in post_date or "лет" in post_date:
+            return 0, False
+
+        if "назад" in post_date:
+            return time.time(), False
+
+        post_date = post_date.split(' в ')
+        post_date = {
+            'date': post_date[0],
+            'time': post_date[1]
+        }
+        if post_date['date'] == 'сегодня':
+            post_date['date'] = datetime.datetime.now().strftime("%d-%m-%Y")
+        elif post_date['date'] == 'вчера':
+            post_date['date'] = datetime.datetime.now() - datetime.timedelta(days=1)
+            post_date['date'] = post_date['date'].strftime("%d-%m-%Y")
+        else:
+            post_date['date'] = post_date['date'].split(' ')
+            post_date['date'][1] = months[post_date['date'][1]]
+            if len(post_date['date']) == 2:
+                post_date['date'].append(str(datetime.datetime.now().year))
+            post_date['date'] = '-'.join(str(v) for v in post_date['date'])
+
+        post_date_string = post_date['date'] + ' ' + post_date['time']
+        post_date = datetime.datetime.strptime(post_date_string, '%d-%m-%Y %H:%M')
+        return post_date.timestamp(), False
+    except Exception:
+        return 0, True
+
+
+def legacy_count(number):
+    if number == '':
+        return 0
+    result = float(re.search(r'[\d\.]+', number).group())
+    if 'K' in number:
+        result = result * 1000
+    if 'M' in number:
+        result = result * 1000000
+    if 'B' in number:
+        result = result * 1000000000
+    return result
+
+
+def load_corpus():
+    dates, counters = [], []
+    for name in ('group_wall.html', 'profile_wall.html'):
+        soup = parse_page(load_fixture(name), SCOPE_WALL)
+        for post in soup.select('.post'):
+            post_date = post.select_one('.post_header .post_date')
+            if post_date is not None:
+                dates.append(post_date.getText())
+            counters += [counter.getText() for counter in
+                         post.select('.post_like_count._count, .post_share_count._count, .post_views_count._count')]
+    return dates * REPEAT, counters * REPEAT
+
+
+def report(dates):
+    normalizer = PostMetaNormalizer()
+    raised = sum(1 for text in dates if legacy_date(text)[1])
+    today = [text for text in set(dates) if text.startswith('сегодня')]
+    wrong = sum(1 for text in today if legacy_date(text)[0] == 0)
+    unknown = sum(1 for text in set(dates) if normalizer.parse_date(text) == 0)
+    print('%d dates, %d distinct: the old code raised on %d and lost %d of %d "сегодня" dates, '
+          'the normalizer left %d unparsed' % (len(dates), len(set(dates)), raised, wrong, len(today), unknown))
+
+
+def build_cases(dates, counters):
+    def normalize_dates():
+        normalizer = PostMetaNormalizer()
+        return [normalizer.parse_date(text) for text in dates]
+
+    def normalize_counters():
+        normalizer = PostMetaNormalizer()
+        return [normalizer.parse_count(text) for text in counters]
+
+    return [
+        ('legacy: dates x%d' % len(dates), lambda: [legacy_date(text) for text in dates]),
+        ('PostMetaNormalizer dates x%d' % len(dates), normalize_dates),
+        ('legacy: counters x%d' % len(counters), lambda: [legacy_count(text) for text in counters]),
+        ('PostMetaNormalizer counters x%d' % len(counters), normalize_counters),
+    ]
+
+
+if __name__ == '__main__':
+    dates, counters = load_corpus()
+    report(dates)
+    main(build_cases(dates, counters), __doc__, number=200)
@@ -0,0 +1,116 @@
+"""
+Response marker and token extraction: vk_responses against the inline
+regexes it replaced
+
+Before timing, every extractor is checked to give what the old regex
+gave on the fixture pages; a mismatch stops the run.
+
+Run from the repository root:
+    python benchmarks/bench_responses.py [-n 200]
+
+"""
+import re
+
+from harness import load_fixture, main
+
+import vk_responses
+
+
+def legacy_search(text):
+    try:
+        re.search('"has_more":true', text).group(0)
+        new_offset = int(re.search('"offset":([0-9]+)', text).group(1))
+    except AttributeError:
+        new_offset = None
+    buttons = re.findall('<button id="search_sub([0-9]+)"([^>]*)this, ([0-9]+), \'([^>]*)\', true([^>]*)>Добавить в друзья</button>', text)
+    ids = []
+    for friend_id, trash, same_id, friend_hash, button_end in buttons:
+        if not re.match('(.*)display: none;(.*)', button_end):
+            ids.append((friend_id, friend_hash))
+    return ids, new_offset
+
+
+def legacy_friend_requests(text):
+    return re.findall(
+        '<button([^>]*)accept_request_([0-9]+)([^>]*)Friends.acceptRequest\\(([0-9]+), \'([^>]*)\', this\\)">Добавить в друзья</button>',
+        text)
+
+
+def legacy_captcha(text):
+    if re.match('(.*)Вы подписались', text):
+        return True
+    if re.match('(.*)<!>ru', text):
+        return re.search('(.+)<!>2<!>(.+)<!>2<!>ru', text).group(2)
+
+
+def check_extractors():
+    """
+    Assert vk_responses finds the same people, offsets, hashes, ids and
+    captcha keys as the legacy regexes on the fixtures
+
+    """
+    search = load_fixture('al_search.txt')
+    friends = load_fixture('friends_requests.html')
+    profile = load_fixture('profile_wall.html')
+    captcha = load_fixture('al_feed_captcha.txt')
+    published = load_fixture('like_publish_done.txt')
+    publish_box = load_fixture('like_publish_box.txt')
+
+    people, offset = legacy_search(search)
+    page = vk_responses.parse_search_response(search)
+    assert people, 'the al_search fixture has no people'
+    assert page.people == people, 'parse_search_response people differ'
+    assert page.offset == offset, 'parse_search_response offset differs'
+
+    requests = [(friend_id, friend_hash) for _, friend_id, _, _, friend_hash in legacy_friend_requests(friends)]
+    assert requests, 'the friends fixture has no requests'
+    assert vk_responses.find_friend_requests(friends) == requests, 'find_friend_requests differs'
+    assert vk_responses.find_friend_requests(profile) == [] == legacy_friend_requests(profile)
+
+    admin_hash = re.search('\\\\n    hash: \'([^\']+)\',\\\\n', profile).group(1)
+    assert vk_responses.find_admin_hash(profile) == admin_hash, 'find_admin_hash differs'
+    vk_id = re.search(r',\n  id: ([0-9]+)', profile, re.M).group(1)
+    assert vk_responses.find_vk_id(profile) == vk_id, 'find_vk_id differs'
+    share_hash = re.search('shHash: \'([^\']+)\'', publish_box).group(1)
+    assert vk_responses.find_share_hash(publish_box) == share_hash, 'find_share_hash differs'
+
+    result = vk_responses.parse_action_response(captcha, vk_responses.MARKER_SUBSCRIBED)
+    assert result.captcha_key and result == (vk_responses.STATUS_CAPTCHA, legacy_captcha(captcha)), 'captcha key differs'
+    result = vk_responses.parse_action_response(published, vk_responses.MARKER_POST_SHARED)
+    assert result.status == vk_responses.STATUS_OK and re.match('(.*)Запись отправлена', published)
+    result = vk_responses.parse_action_response(profile, vk_responses.MARKER_POST_SHARED)
+    assert result.status != vk_responses.STATUS_OK and not re.match('(.*)Запись отправлена', profile)
+
+
+def build_cases():
+    search = load_fixture('al_search.txt')
+    friends = load_fixture('friends_requests.html')
+    profile = load_fixture('profile_wall.html')
+    captcha = load_fixture('al_feed_captcha.txt')
+    published = load_fixture('like_publish_done.txt')
+    publish_box = load_fixture('like_publish_box.txt')
+
+    return [
+        ('legacy: al_search people/offset', lambda: legacy_search(search)),
+        ('parse_search_response', lambda: vk_responses.parse_search_response(search)),
+        ('legacy: friend requests', lambda: legacy_friend_requests(friends)),
+        ('find_friend_requests', lambda: vk_responses.find_friend_requests(friends)),
+        ('legacy: friend requests (none)', lambda: legacy_friend_requests(profile)),
+        ('find_friend_requests (none)', lambda: vk_responses.find_friend_requests(profile)),
+        ('legacy: admin hash', lambda: re.search('\\\\n    hash: \'([^\']+)\',\\\\n', profile).group(1)),
+        ('find_admin_hash', lambda: vk_responses.find_admin_hash(profile)),
+        ('legacy: vk id', lambda: re.search(r',\n  id: ([0-9]+)', profile, re.M).group(1)),
+        ('find_vk_id', lambda: vk_responses.find_vk_id(profile)),
+        ('legacy: shHash', lambda: re.search('shHash: \'([^\']+)\'', publish_box).group(1)),
+        ('find_share_hash', lambda: vk_responses.find_share_hash(publish_box)),
+        ('legacy: captcha key', lambda: legacy_captcha(captcha)),
+        ('parse_action_response (captcha)', lambda: vk_responses.parse_action_response(captcha, vk_responses.MARKER_SUBSCRIBED)),
+        ('legacy: "Запись отправлена" on profile', lambda: re.match('(.*)Запись отправлена', profile)),
+        ('parse_action_response (profile)', lambda: vk_responses.parse_action_response(profile, vk_responses.MARKER_POST_SHARED)),
+        ('parse_action_response (published)', lambda: vk_responses.parse_action_response(published, vk_responses.MARKER_POST_SHARED)),
+    ]
+
+
+if __name__ == '__main__':
+    check_extractors()
+    main(build_cases(), 'vk_responses extractors on the fixture corpus')
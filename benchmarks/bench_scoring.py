@@ -0,0 +1,103 @@
+"""
+Picking the best repost candidates: the full sort by rating it replaced
+against PostScorer (NumPy arrays, time decay, argpartition top-k)
+
+Both sides start from the candidates in an in-memory PostStore, as the
+bot does: the legacy sort reads them as records, PostScorer as plain
+rows. Before timing, PostScorer without decay is checked to pick posts
+as good as the legacy sort's.
+
+Run from the repository root:
+    python benchmarks/bench_scoring.py [-n 50]
+
+"""
+import random
+import time
+
+from harness import main
+
+from post_record import PostRecord
+from post_store import PostStore
+import scoring
+from scoring import PostScorer
+
+TOP = 30
+
+
+def make_pool(size, now, seed=7):
+    rnd = random.Random(seed)
+    pool = []
+    for i in range(size):
+        views = rnd.choice([0, rnd.randint(1, 100), rnd.randint(100, 2000000)])
+        likes = rnd.randint(0, max(views // 10, 1))
+        reposts = rnd.randint(0, max(likes // 5, 1))
+        post = PostRecord(owner_id=-rnd.randint(1, 10 ** 8), post_id=i, date=now - rnd.uniform(0, 3 * 24 * 3600),
+                          likes=likes, reposts=reposts, views=views)
+        post.rating = (likes + reposts) / views * 100 if views else 0
+        pool.append(post)
+    return pool
+
+
+def make_store(size, now):
+    store = PostStore(':memory:')
+    store.add_posts('https://vk.com/wall', make_pool(size, now))
+    return store
+
+
+def legacy_top(store):
+    pool = store.get_candidates(0)
+    return sorted(pool, key=lambda k: k.rating, reverse=True)[:TOP]
+
+
+def legacy_top_decayed(store, now, half_life=24 * 60 * 60):
+    pool = store.get_candidates(0)
+    return sorted(pool, key=lambda k: k.rating * 0.5 ** ((now - k.date) / half_life), reverse=True)[:TOP]
+
+
+def without_numpy(function):
+    numpy, scoring.numpy = scoring.get_numpy(), None
+    try:
+        return function()
+    finally:
+        scoring.numpy = numpy
+
+
+def check_top(now):
+    """
+    Assert PostScorer without decay picks posts rated as the legacy sort's,
+    with and without NumPy, and leaves out the excluded ones
+
+    """
+    store = make_store(1000, now)
+    scorer = PostScorer(half_life=None)
+    expected = [round(post.rating, 9) for post in legacy_top(store)]
+    for top in (scorer.top(store.get_candidate_rows(0), TOP, now),
+                without_numpy(lambda: scorer.top(store.get_candidate_rows(0), TOP, now))):
+        assert [round(row[-1], 9) for row in top] == expected, 'PostScorer.top differs from the legacy sort'
+    exclude = {post.key for post in legacy_top(store)[:10]}
+    top = scorer.top(store.get_candidate_rows(0), TOP, now, exclude=exclude)
+    assert len(top) == TOP and not {row[:2] for row in top} & exclude, 'excluded posts are picked'
+
+
+def build_cases():
+    now = time.time()
+    scorer = PostScorer()
+    cases = []
+    for size in (100, 1000, 10000):
+        store = make_store(size, now)
+        cases += [
+            ('legacy: sort %d, take %d' % (size, TOP), lambda s=store: legacy_top(s)),
+            ('legacy + decay: sort %d, take %d' % (size, TOP), lambda s=store: legacy_top_decayed(s, now)),
+            ('PostScorer.top %d of %d' % (TOP, size),
+             lambda s=store: scorer.top(s.get_candidate_rows(0), TOP, now)),
+        ]
+
+    store = make_store(10000, now)
+    cases.append(('PostScorer.top %d of 10000, no NumPy' % TOP,
+                  lambda: without_numpy(lambda: scorer.top(store.get_candidate_rows(0), TOP, now))))
+    return cases
+
+
+if __name__ == '__main__':
+    check_top(time.time())
+    main(build_cases(), __doc__, number=50)
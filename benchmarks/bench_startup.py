@@ -0,0 +1,48 @@
+"""
+Start-up cost of the bot: a fresh interpreter importing bot.py, and the
+command line answering --help, against the eager imports bot.py used to do
+
+Every call starts a new process, so keep -n small. After the timings the
+heavy modules that `import bot` still loads are listed, there should be
+none of them: bs4, numpy and python3_anticaptcha come on first use.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py [-n 10]
+
+"""
+import json
+import subprocess
+import sys
+
+from harness import ROOT_DIR, main
+
+HEAVY_MODULES = ('bs4', 'lxml', 'numpy', 'python3_anticaptcha', 'aiohttp')
+
+
+def run_python(*args):
+    subprocess.run((sys.executable,) + args, cwd=ROOT_DIR, check=True, stdout=subprocess.DEVNULL)
+
+
+def get_loaded_modules():
+    """
+    :return: list of str heavy modules present in sys.modules after `import bot`
+
+    """
+    code = 'import json, sys, bot; print(json.dumps(sorted(sys.modules)))'
+    output = subprocess.run((sys.executable, '-c', code), cwd=ROOT_DIR, check=True, stdout=subprocess.PIPE).stdout
+    return [name for name in json.loads(output.decode('utf-8')) if name in HEAVY_MODULES]
+
+
+def build_cases():
+    return [
+        ('bare interpreter', lambda: run_python('-c', 'pass')),
+        ('legacy: eager bs4, numpy, python3_anticaptcha',
+         lambda: run_python('-c', 'import requests, bs4, lxml, numpy, python3_anticaptcha')),
+        ('import bot', lambda: run_python('-c', 'import bot')),
+        ('bot.py --help', lambda: run_python('bot.py', '--help')),
+    ]
+
+
+if __name__ == '__main__':
+    main(build_cases(), __doc__, number=10)
+    print('heavy modules loaded by `import bot`: %s' % (', '.join(get_loaded_modules()) or 'none'))
@@ -0,0 +1,48 @@
+"""
+Full download against early-terminating streamed reads of wall pages
+
+Every case reads a fixture page the way the bot does and parses the
+posts list. Besides latency and memory the bytes pulled from the
+"network" are printed.
+
+Run from the repository root:
+    python benchmarks/bench_streaming.py [-n 50]
+
+"""
+from harness import FixtureResponse, load_fixture, main
+
+from page_parser import SCOPE_WALL, parse_page
+from page_stream import read_page
+
+
+def full(markup):
+    r = FixtureResponse(markup)
+    parse_page(r.text, SCOPE_WALL)
+    return r.bytes_sent
+
+
+def streamed(markup, max_posts=None):
+    r = FixtureResponse(markup)
+    read_page(r, max_posts)
+    parse_page(r.text, SCOPE_WALL)
+    return r.bytes_sent
+
+
+def build_cases():
+    cases = []
+    for name in ('group_wall.html', 'profile_wall.html'):
+        markup = load_fixture(name)
+        cases += [
+            ('%s full body' % name, lambda m=markup: full(m)),
+            ('%s up to the wall end' % name, lambda m=markup: streamed(m)),
+            ('%s first post only' % name, lambda m=markup: streamed(m, 1)),
+        ]
+    return cases
+
+
+if __name__ == '__main__':
+    cases = build_cases()
+    main(cases, 'streamed wall reads on the fixture corpus')
+    print()
+    for name, fn in cases:
+        print('%-44s %10d bytes' % (name, fn()))
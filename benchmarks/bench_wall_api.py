@@ -0,0 +1,88 @@
+"""
+Reading the walls of the groups and of the other bots as pages against
+reading them through the API, over HTTP from the local stand-in server
+
+A page read is one request, a download and a parse per wall; the API
+reads all of them with one execute request and maps its JSON answer to
+PostRecord. The server replays fixtures/wall_get.json, the same posts as
+the saved wall pages, so both give the same records.
+
+Run from the repository root:
+    python benchmarks/bench_wall_api.py [-n 10] [--latency 0.05]
+
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from harness import main
+from stub_server import LocalBot, StubVkServer
+
+from vk_bots import bots
+from vk_groups import groups
+from wall_api import WallApi
+
+WALLS = list(groups) + sorted(bots)
+
+
+def read_pages(bot):
+    return {url: [bot._parse_wall_post(post) for post in soup.select('.wall_posts .post.own')
+                  if not post.select_one('.wall_marked_as_ads')]
+            for url, soup in bot._fetch_walls(WALLS)}
+
+
+def read_api(bot):
+    return bot._fetch_api_walls(WALLS)
+
+
+def check_same_records(pages, api):
+    """
+    :param pages: dict of url: list of PostRecord read from the pages
+    :param api: dict of url: list of PostRecord read through the API
+    :return: list of str differences
+
+    """
+    # not the dates, the relative ones of the pages depend on when they are read
+    fields = ('key', 'original_key', 'pinned', 'author_link', 'copy_author_link', 'likes', 'reposts', 'views')
+    differences = []
+    for url in WALLS:
+        html_posts = pages.get(url, ())
+        api_posts = api.get(url, ())
+        if [post.key for post in html_posts] != [post.key for post in api_posts]:
+            differences.append('%s: other posts' % url)
+            continue
+        for html_post, api_post in zip(html_posts, api_posts):
+            for field in fields:
+                if getattr(html_post, field) != getattr(api_post, field):
+                    differences.append('%s %s %s: %r != %r' % (url, html_post.key, field, getattr(html_post, field),
+                                                              getattr(api_post, field)))
+    return differences
+
+
+def build_cases(server):
+    os.chdir(tempfile.mkdtemp(prefix='vk_bot_wall_api_'))
+    page_bot = LocalBot(server)
+    # as many posts as the saved pages have
+    api_bot = LocalBot(server, wall_api=WallApi('stub-token', count=100))
+    for bot in (page_bot, api_bot):
+        bot._pacer.rate = 1e9
+    return [
+        ('%d walls as pages: %d requests + parse' % (len(WALLS), len(WALLS)), lambda: read_pages(page_bot)),
+        ('%d walls through execute: 1 request' % len(WALLS), lambda: read_api(api_bot)),
+    ], page_bot, api_bot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args, sys.argv[1:] = parser.parse_known_args()
+    server = StubVkServer(latency=args.latency).start()
+    try:
+        cases, page_bot, api_bot = build_cases(server)
+        differences = check_same_records(read_pages(page_bot), read_api(api_bot))
+        print('\n'.join(differences) or 'the API gives the same records as the pages')
+        main(cases, __doc__, number=10)
+        print('%d requests, %s' % (server.requests, ', '.join('%s %d' % item for item in sorted(server.paths.items()))))
+    finally:
+        server.stop()
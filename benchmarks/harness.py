@@ -0,0 +1,167 @@
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def load_fixture(name):
+    """
+    Read a saved page from benchmarks/fixtures
+    :param name: str file name, e.g. 'group_wall.html'
+    :return: str
+
+    """
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FixtureResponse:
+    """
+    The minimal part of requests.Response the bot reads from
+
+    bytes_sent counts what a streamed read actually pulled, as the network
+    would have transferred it.
+
+    """
+
+    def __init__(self, text, status_code=200, url='', headers=None):
+        self._content = text.encode('utf-8')
+        self._content_consumed = False
+        self.encoding = 'utf-8'
+        self.status_code = status_code
+        self.url = url
+        self.headers = headers or {}
+        self.bytes_sent = 0
+
+    @property
+    def content(self):
+        if not self._content_consumed:
+            self.bytes_sent = len(self._content)
+            self._content_consumed = True
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self._content), chunk_size):
+            chunk = self._content[start:start + chunk_size]
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        return None
+
+
+class BenchmarkResult:
+
+    def __init__(self, name, timings, peak_bytes, blocks):
+        self.name = name
+        self.timings = timings
+        self.peak_bytes = peak_bytes
+        self.blocks = blocks
+
+    @property
+    def mean_us(self):
+        return statistics.mean(self.timings) * 1e6
+
+    @property
+    def median_us(self):
+        return statistics.median(self.timings) * 1e6
+
+    @property
+    def min_us(self):
+        return min(self.timings) * 1e6
+
+    def as_row(self):
+        return '%-44s %8d %12.1f %12.1f %12.1f %12.1f %10d' % (
+            self.name, len(self.timings), self.mean_us, self.median_us, self.min_us,
+            self.peak_bytes / 1024, self.blocks)
+
+
+def run_benchmark(name, fn, number=50, warmup=3):
+    """
+    Time fn() and measure what one call allocates
+
+    Latency is taken without tracemalloc running so that tracing does not
+    skew the numbers. Allocations are measured in a separate single call:
+    the peak of memory allocated during the call and the number of blocks
+    still alive after it (that is what the returned value keeps).
+    :param name: str
+    :param fn: callable without arguments
+    :param number: int timed calls
+    :param warmup: int untimed calls before measuring
+    :return: BenchmarkResult
+
+    """
+    for _ in range(warmup):
+        fn()
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    timings = []
+    try:
+        for _ in range(number):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return BenchmarkResult(name, timings, peak - base, blocks)
+
+
+def print_results(results, stream=None):
+    stream = stream or sys.stdout
+    stream.write('%-44s %8s %12s %12s %12s %12s %10s\n' % (
+        'benchmark', 'calls', 'mean, us', 'median, us', 'min, us', 'peak, KiB', 'blocks'))
+    for result in results:
+        stream.write(result.as_row() + '\n')
+
+
+def main(cases, description, number=50):
+    """
+    Command line runner shared by the bench_*.py scripts
+    :param cases: list of (name, fn) pairs
+    :param description: str
+    :param number: int default of timed calls per benchmark
+
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-n', '--number', type=int, default=number, help='timed calls per benchmark')
+    parser.add_argument('-k', '--filter', default='', help='run only benchmarks whose name contains this string')
+    args = parser.parse_args()
+
+    results = []
+    for name, fn in cases:
+        if args.filter and args.filter not in name:
+            continue
+        results.append(run_benchmark(name, fn, number=args.number))
+    print_results(results)
+    return results
@@ -0,0 +1,65 @@
+import time
+
+from harness import FixtureResponse, load_fixture
+
+from bot import SkynetBot
+from post_store import PostStore
+
+
+PROFILE_ID = '53083705'
+
+FIXTURE_ROUTES = {
+    'https://vk.com/': 'profile_wall.html',
+    'https://vk.com/id' + PROFILE_ID: 'profile_wall.html',
+    'https://vk.com/friends?section=requests': 'friends_requests.html',
+    'https://vk.com/forbes': 'group_wall.html',
+}
+
+
+class OfflineBot(SkynetBot):
+    """
+    SkynetBot that serves fixture pages instead of going to the network
+
+    Unknown URLs get the group wall, so every entry of vk_groups.groups
+    resolves to a page with posts.
+
+    """
+
+    def __init__(self, **kwargs):
+        defaults = {
+            'admin_vk_id': PROFILE_ID,
+            'antigate_key': '',
+            'rucaptcha_key': '',
+            'username': '',
+            'password': '',
+            'vk_my_group': 'https://vk.com/forbes',
+            'post_store': PostStore(':memory:'),
+        }
+        defaults.update(kwargs)
+        super().__init__(**defaults)
+        self.vk_id = PROFILE_ID
+        self._fixtures = {}
+        self.requests_made = 0
+
+    def _fixture_response(self, url):
+        name = FIXTURE_ROUTES.get(url, 'group_wall.html')
+        if name not in self._fixtures:
+            self._fixtures[name] = load_fixture(name)
+        self.requests_made += 1
+        return FixtureResponse(self._fixtures[name], url=url)
+
+    def _get(self, url, *args, **kwargs):
+        self._pacer.acquire()
+        return self._fixture_response(url)
+
+    def _post(self, url, *args, **kwargs):
+        self._pacer.acquire()
+        return self._fixture_response(url)
+
+
+def disable_sleep():
+    """
+    Make the bot's pacing sleeps free for the rest of the process
+
+    """
+    time.sleep = lambda seconds: None
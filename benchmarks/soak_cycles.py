@@ -0,0 +1,105 @@
+"""
+Soak test of a long-running bot against the local stand-in server
+
+One bot runs thousands of cycles over HTTP, as it would for weeks. Its
+own wall is made to look old enough to repost from, so every repost
+cycle crawls the group walls and the walls of the other bots. After the
+warm-up and at the end the traced Python memory and the RSS are sampled,
+both after a full collection, and must not have grown. The objects the
+garbage collector had to find on its own during the run are reported
+too: trees that are released right away do not end up there.
+
+Run from the repository root:
+    python benchmarks/soak_cycles.py [--cycles 2000] [--api] [--http-cache]
+
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from soak_supervisor import get_rss
+from stub_server import LocalBot, StubVkServer
+
+from bot import cycle_bot
+from http_cache import HttpCache
+from scheduler import ActionScheduler
+from wall_api import WallApi
+
+
+def count_collected():
+    return sum(generation['collected'] for generation in gc.get_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='long-running bot soak test')
+    parser.add_argument('--cycles', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--api', action='store_true', help='read the walls through the API')
+    parser.add_argument('--http-cache', action='store_true', help='read the walls through the HttpCache')
+    parser.add_argument('--max-growth-kib', type=int, default=256, help='traced memory growth allowed')
+    parser.add_argument('--max-rss-growth-mib', type=int, default=8)
+    args = parser.parse_args()
+    if args.cycles <= args.warmup:
+        parser.error('--cycles must be larger than --warmup')
+
+    directory = tempfile.mkdtemp(prefix='vk_bot_soak_cycles_')
+    os.chdir(directory)
+    time.sleep = lambda seconds: None
+    server = StubVkServer(require_login=True).start()
+    kwargs = {}
+    if args.api:
+        kwargs['wall_api'] = WallApi('stub-token')
+    if args.http_cache:
+        kwargs['http_cache'] = HttpCache(os.path.join(directory, 'http_cache'), ttl=0)
+    bot = LocalBot(server, **kwargs)
+    bot._pacer.rate = 1e9
+    # every repost cycle goes past the age check and crawls the walls
+    bot._get_bot_last_post_age = lambda: 0
+    scheduler = ActionScheduler(bot.get_action_policies())
+
+    samples = {}
+    now = time.time()
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        for cycle in range(args.cycles):
+            if cycle == args.warmup:
+                gc.collect()
+                samples['warmup'] = (tracemalloc.get_traced_memory()[0], get_rss(), count_collected())
+            now += scheduler.next_delay(now)
+            cycle_bot(scheduler, bot, now)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        server.stop()
+    elapsed = time.perf_counter() - started
+    collected = count_collected() - samples['warmup'][2]
+    gc.collect()
+    traced, rss = tracemalloc.get_traced_memory()[0], get_rss()
+    tracemalloc.stop()
+    bot.close()
+
+    growth = (traced - samples['warmup'][0]) / 1024
+    rss_growth = (rss - samples['warmup'][1]) / 2 ** 20
+    print('%d cycles in %.1f s, %d requests, %d logins, walls read through %s' % (
+        args.cycles, elapsed, server.requests, server.logins,
+        'the API' if args.api else 'the HttpCache' if args.http_cache else 'the pages'))
+    print('objects left to the garbage collector after warm-up: %d' % collected)
+    print('traced memory after warm-up %.1f KiB, at the end %.1f KiB, growth %.1f KiB' % (
+        samples['warmup'][0] / 1024, traced / 1024, growth))
+    print('rss after warm-up %.1f MiB, at the end %.1f MiB, growth %.1f MiB' % (
+        samples['warmup'][1] / 2 ** 20, rss / 2 ** 20, rss_growth))
+
+    assert growth < args.max_growth_kib, 'traced memory grows with the cycles'
+    assert rss_growth < args.max_rss_growth_mib, 'rss grows with the cycles'
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
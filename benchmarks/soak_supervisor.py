@@ -0,0 +1,118 @@
+"""
+Soak test of the supervisor loop against the local stand-in server
+
+The bot runs real cycles over HTTP against StubVkServer, which drops every
+n-th connection; runs the retries cannot save crash in the middle of
+actions, the runs that get through their cycles are ended on purpose. After thousands of restarts the
+stack depth, the number of live bots, the traced Python memory and the RSS
+must be where they were after the warm-up.
+
+Run from the repository root:
+    python benchmarks/soak_supervisor.py [--starts 500]
+
+"""
+import argparse
+import gc
+import inspect
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import weakref
+
+from stub_server import LocalBot, StubVkServer
+
+from bot import cycle_bot
+from metrics import Metrics
+from scheduler import ActionScheduler
+from supervisor import Supervisor
+
+
+class SoakRestart(Exception):
+    pass
+
+
+def get_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, ValueError):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='supervisor soak test')
+    parser.add_argument('--starts', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--cycles', type=int, default=1, help='cycles per start that do not crash')
+    parser.add_argument('--fail-every', type=int, default=13)
+    parser.add_argument('--max-growth-kib', type=int, default=512)
+    args = parser.parse_args()
+    if args.starts <= args.warmup:
+        parser.error('--starts must be larger than --warmup')
+
+    os.chdir(tempfile.mkdtemp(prefix='vk_bot_soak_'))
+    time.sleep = lambda seconds: None
+    server = StubVkServer(fail_every=args.fail_every).start()
+
+    bots = weakref.WeakSet()
+    depths = set()
+    samples = {}
+    finished_runs = [0]
+
+    def create_bot():
+        bot = LocalBot(server)
+        bots.add(bot)
+        return bot
+
+    def run(bot):
+        depths.add(len(inspect.stack(0)))
+        if supervisor.starts == args.warmup:
+            gc.collect()
+            samples['warmup'] = (tracemalloc.get_traced_memory()[0], get_rss())
+        if os.path.exists('tmp/vk_schedule.out'):
+            os.remove('tmp/vk_schedule.out')
+        scheduler = ActionScheduler(bot.get_action_policies())
+        for _ in range(args.cycles):
+            cycle_bot(scheduler, bot)
+        finished_runs[0] += 1
+        raise SoakRestart()
+
+    metrics = Metrics()
+    supervisor = Supervisor(create_bot, run, metrics=metrics)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        supervisor.run(max_starts=args.starts)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        server.stop()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    traced, rss = tracemalloc.get_traced_memory()[0], get_rss()
+    tracemalloc.stop()
+
+    stat = supervisor.get_stat()
+    growth = (traced - samples['warmup'][0]) / 1024
+    print('starts %d, crashes %d (%d on dropped connections), %.1f s, %d requests' % (
+        stat['starts'], stat['crashes'], stat['crashes'] - finished_runs[0], elapsed, server.requests))
+    print('stack depths seen: %s' % sorted(depths))
+    print('live bots: %d' % len(bots))
+    print('traced memory after warm-up %.1f KiB, at the end %.1f KiB, growth %.1f KiB' % (
+        samples['warmup'][0] / 1024, traced / 1024, growth))
+    print('rss after warm-up %.1f MiB, at the end %.1f MiB' % (samples['warmup'][1] / 2 ** 20, rss / 2 ** 20))
+
+    assert metrics.get_counter('vk_supervisor_starts_total') == stat['starts'], 'starts are not counted'
+    assert metrics.get_counter('vk_supervisor_crashes_total') == stat['crashes'], 'crashes are not counted'
+    assert len(depths) == 1, 'the stack grows with restarts'
+    assert len(bots) <= 1, 'crashed bots are kept alive'
+    assert growth < args.max_growth_kib, 'memory grows with restarts'
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
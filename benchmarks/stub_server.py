@@ -0,0 +1,244 @@
+"""
+A local stand-in for vk.com that serves the fixture pages
+
+    server = StubVkServer(latency=0.02, fail_every=7).start()
+    bot = LocalBot(server)  # a SkynetBot with its hosts pointed at the server
+    ...
+    server.stop()
+
+vk.com, login.vk.com and api.vk.com are served, the last two under the
+/login.vk.com and /api.vk.com path prefixes (see StubVkServer.hosts).
+The API answers execute requests made of wall.get calls by replaying the
+walls recorded in fixtures/wall_get.json.
+
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from harness import load_fixture
+
+from bot import SkynetBot
+
+PROFILE_ID = '53083705'
+SESSION_COOKIE = 'remixsid'
+LOGIN_PREFIX = '/login.vk.com'
+API_PREFIX = '/api.vk.com'
+# the calls of an execute code as WallApi writes them
+API_WALL_GET_RE = re.compile(r'API\.wall\.get\((\{[^}]*\})\)')
+
+# al_*.php answers the bot checks for
+AL_RESPONSES = {
+    '/al_feed.php': '<!--1452<!><!>0<!>6866<!>0<!>Вы подписались на новости пользователя.',
+    '/al_friends.php': '<!--1452<!><!>0<!>6866<!>0<!>Пользователь теперь у Вас в друзьях.',
+    '/al_im.php': '<!--1452<!><!>0<!>6866<!>0<!>{"sent":1}',
+    '/al_index.php': '<!--1452<!><!>0<!>6866<!>0<!>',
+}
+# the page login.vk.com redirects to
+LOGIN_DONE = '<html lang="ru"><script>parent.onLoginDone(\'/id%s\', {"uid":"%s"});</script></html>' % (
+    PROFILE_ID, PROFILE_ID)
+
+
+class StubVkHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle(urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('content-length') or 0)
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+        self._handle(form)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, form):
+        started = time.thread_time()
+        try:
+            self._respond(urllib.parse.urlparse(self.path).path, form)
+        finally:
+            with self.server.lock:
+                self.server.cpu += time.thread_time() - started
+
+    def _respond(self, path, form):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+            server.paths[path] = server.paths.get(path, 0) + 1
+        if server.latency:
+            # not time.sleep, the benchmarks make that free
+            threading.Event().wait(server.latency)
+        if server.fail_every and number % server.fail_every == 0:
+            # drop the connection without an answer, as a broken network would
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+
+        if path.startswith(LOGIN_PREFIX):
+            return self._login(form)
+        if path.startswith(API_PREFIX):
+            return self._api(path[len(API_PREFIX):], form)
+        if path == '/login.php':
+            return self._send(200, LOGIN_DONE.encode('utf-8'))
+
+        body = self._get_body(path, form).encode('utf-8')
+        if self.command == 'GET':
+            # pages are validated like a static server would do it
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('if-none-match') == etag:
+                with server.lock:
+                    server.not_modified += 1
+                return self._send(304, b'', {'etag': etag})
+            return self._send(200, body, {'etag': etag})
+        self._send(200, body)
+
+    def _api(self, path, form):
+        if not form.get('access_token'):
+            answer = {'error': {'error_code': 5, 'error_msg': 'User authorization failed: no access_token passed.'}}
+        elif path != '/method/execute':
+            answer = {'error': {'error_code': 3, 'error_msg': 'Unknown method passed'}}
+        else:
+            walls = self.server.get_recorded_walls()
+            response = []
+            for call in API_WALL_GET_RE.findall(form.get('code', [''])[0]):
+                params = json.loads(call)
+                wall = walls['profile' if params.get('owner_id', 0) > 0 else 'group']
+                response.append(dict(wall, items=wall['items'][:params.get('count', 20)]))
+            answer = {'response': response}
+        self._send(200, json.dumps(answer, ensure_ascii=False).encode('utf-8'), content_type='application/json')
+
+    def _get_body(self, path, form):
+        if self.server.require_login and not path.endswith('.php') and \
+                SESSION_COOKIE + '=' not in (self.headers.get('cookie') or ''):
+            # vk.com shows its pages to logged out visitors with the login form
+            return self.server.fixture('login.html')
+        if path in AL_RESPONSES:
+            return AL_RESPONSES[path]
+        if path == '/like.php':
+            if form.get('act') == ['publish_box']:
+                return self.server.fixture('like_publish_box.txt')
+            return self.server.fixture('like_publish_done.txt')
+        if path == '/al_search.php':
+            return self.server.fixture('al_search.txt')
+        if path == '/friends':
+            return self.server.fixture('friends_requests.html')
+        if path == '/':
+            return self.server.fixture('profile_wall.html')
+        if path.startswith('/id'):
+            return self.server.fixture('profile_wall.html')
+        return self.server.fixture('group_wall.html')
+
+    def _login(self, form):
+        if form.get('act') != ['login'] or not form.get('ip_h') or not form.get('lg_h'):
+            return self._send(302, b'', {'location': 'https://vk.com/login?act=failed'})
+        with self.server.lock:
+            self.server.logins += 1
+        location = 'https://vk.com/login.php?act=slogin&to=&s=1&__q_hash=5e2b64a3c9d8f1e0'
+        session = hashlib.md5(str(time.time()).encode('utf-8')).hexdigest()
+        self._send(302, b'', {'location': location, 'set-cookie': '%s=%s; path=/' % (SESSION_COOKIE, session)})
+
+    def _send(self, status, body, headers=None, content_type='text/html'):
+        self.send_response(status)
+        self.send_header('content-type', content_type + '; charset=utf-8')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubVkServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0, fail_every=0, require_login=False):
+        """
+        :param port: int, 0 picks a free one
+        :param latency: float seconds every answer is delayed by
+        :param fail_every: int drop every n-th request, 0 to answer all of them
+        :param require_login: bool show the login page instead of the pages until the bot logs in
+
+        """
+        super().__init__(('127.0.0.1', port), StubVkHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.require_login = require_login
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.logins = 0
+        self.cpu = 0.0
+        self.paths = {}
+        self._fixtures = {}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    @property
+    def hosts(self):
+        """
+        The hosts argument of SkynetBot that sends its requests here
+        :return: dict
+
+        """
+        return {
+            'https://vk.com': self.base_url,
+            'https://login.vk.com': self.base_url + LOGIN_PREFIX,
+            'https://api.vk.com': self.base_url + API_PREFIX,
+        }
+
+    def handle_error(self, request, client_address):
+        # the bot closes streamed pages early, resets are expected
+        pass
+
+    def fixture(self, name):
+        if name not in self._fixtures:
+            self._fixtures[name] = load_fixture(name)
+        return self._fixtures[name]
+
+    def get_recorded_walls(self):
+        """
+        :return: dict of 'group' and 'profile' wall.get answers
+
+        """
+        if 'wall_get.json' not in self._fixtures:
+            self._fixtures['wall_get.json'] = json.loads(load_fixture('wall_get.json'))
+        return self._fixtures['wall_get.json']
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalBot(SkynetBot):
+    """
+    SkynetBot talking to a StubVkServer
+
+    """
+
+    def __init__(self, server, **kwargs):
+        defaults = {
+            'admin_vk_id': PROFILE_ID,
+            'antigate_key': '',
+            'rucaptcha_key': '',
+            'username': 'stub',
+            'password': 'stub',
+            'vk_my_group': 'https://vk.com/buzovaofficial',
+            'hosts': server.hosts,
+        }
+        defaults.update(kwargs)
+        super().__init__(**defaults)
@@ -1,23 +1,34 @@
-import datetime
+import argparse
+import functools
+import logging
 import os
-import pickle
 import random
-import re
 import requests
-import sched
-import sys
 import time
 import urllib.parse
 
-from bs4 import BeautifulSoup
-from python3_anticaptcha import NoCaptchaTaskProxyless
-
 from cities import Cities
-from logger import Logger
-from months import months
+from http_cache import HttpCache
+from logger import INFO, WARNING, Logger
+from metrics import Metrics, endpoint_label, timed_action
+from pacer import TokenBucket
+from page_cache import PageCache
+from page_parser import SCOPE_COUNTERS, SCOPE_WALL, parse_page, release_document
+from page_stream import WALL_END_MARKERS, post_marker, read_page
+from post_meta import PostMetaNormalizer
+from post_record import PostRecord, build_reposted_index, parse_post_key
+from post_store import PostStore, record_from_row
+from profiler import CycleProfiler
+from scheduler import ActionPolicy, ActionScheduler
+from scoring import PostScorer
+from session_state import SessionState
+from session_store import SessionStore
+from supervisor import Supervisor
 from vk_bots import bots
 from vk_groups import groups
-import settings
+from wall_api import EXECUTE_URL, WallApi
+import transport
+import vk_responses
 
 
 class SkynetBot:
@@ -49,11 +60,25 @@ class SkynetBot:
         ACTION_REPOST_RANDOM: 60 * 60 * 12,
     }
 
+    # the bot sleeps at night, the stat is only sent in the morning
+    _actions_hours = {
+        'day': range(4, 24),
+        'stat': [11]
+    }
+
     _reposts_min_periods = {
         'our_post': 60 * 60 * 20,
         'random_post': 60 * 60 * 65
     }
 
+    # how long a crawled post stays a repost candidate and how long it is kept at all
+    _random_posts_max_ages = {
+        'candidate': 60 * 60 * 24 * 3,
+        'stored': 60 * 60 * 24 * 30
+    }
+    # a random post is picked from this many best scored candidates
+    _random_posts_top = 30
+
     _actions_timestamps = {
         ACTION_ONLINE: 0,
         ACTION_ADD_FRIEND: 0,
@@ -63,9 +88,23 @@ class SkynetBot:
         ACTION_REPOST_OUR: 0,
         ACTION_REPOST_RANDOM: 0,
     }
+    # vk.com requests are paced to one per 3 seconds on average
+    _requests_rate = 1 / 3.0
+
     _cities = None
+    _hosts = None
+    _http_cache = None
     _logger = None
+    _metrics = None
+    _normalizer = None
+    _pacer = None
+    _page_cache = None
+    _post_store = None
+    _scorer = None
     _session = None
+    _session_state = None
+    _session_store = None
+    _wall_api = None
 
     def __init__(self, **kwargs):
         self.admin_vk_id = kwargs['admin_vk_id']
@@ -75,9 +114,32 @@ class SkynetBot:
         self.vk_password = kwargs['password']
         self.vk_my_group = kwargs['vk_my_group']
         self._cities = Cities()
+        self._pacer = TokenBucket(self._requests_rate)
+        self._page_cache = PageCache()
+        self._metrics = Metrics()
+        self._session_store = SessionStore()
+        self._session_state = SessionState()
+        self._scorer = PostScorer()
+        if 'hosts' in kwargs:
+            self._hosts = kwargs['hosts']
+        if 'http_cache' in kwargs:
+            self._http_cache = kwargs['http_cache']
         if 'logger' in kwargs:
             self._logger = kwargs['logger']
-
+        if 'metrics' in kwargs:
+            self._metrics = kwargs['metrics']
+        if 'post_store' in kwargs:
+            self._post_store = kwargs['post_store']
+        if 'scorer' in kwargs:
+            self._scorer = kwargs['scorer']
+        if 'session_state' in kwargs:
+            self._session_state = kwargs['session_state']
+        if 'session_store' in kwargs:
+            self._session_store = kwargs['session_store']
+        if 'wall_api' in kwargs:
+            self._wall_api = kwargs['wall_api']
+
+    @timed_action
     def add_friend(self):
         """
         Find a friend and send him a request
@@ -102,30 +164,27 @@ class SkynetBot:
                 }
                 if captcha_res:
                     params['recaptcha'] = captcha_res
-                time.sleep(3)
                 response = self._post('https://vk.com/al_feed.php', data=params)
                 return response
 
             r = send_friend_request(friend_id, friend_hash)
+            result = vk_responses.parse_action_response(r.text, vk_responses.MARKER_SUBSCRIBED)
 
-            if re.match('(.*)Вы подписались', r.text):
+            if result.status == vk_responses.STATUS_OK:
+                self._page_cache.invalidate()
                 self._save_session()
                 self._log('a friend ' + str(friend_id) + ' added successfully')
                 return True
-            if re.match('(.*)<!>ru', r.text):
-                try:
-                    captcha_key = re.search('(.+)<!>2<!>(.+)<!>2<!>ru', r.text).group(2)
-                except AttributeError:
-                    self._log('error: AttributeError captcha_key regex')
-                    return False
-
-                captcha_response = self._solve_captcha(captcha_key)
+            if result.status == vk_responses.STATUS_CAPTCHA:
+                captcha_response = self._solve_captcha(result.captcha_key)
                 if not captcha_response:
                     self._log('error: not captcha_response')
                     return False
 
                 r = send_friend_request(friend_id, friend_hash, captcha_response)
-                if re.match('(.*)Вы подписались', r.text):
+                result = vk_responses.parse_action_response(r.text, vk_responses.MARKER_SUBSCRIBED)
+                if result.status == vk_responses.STATUS_OK:
+                    self._page_cache.invalidate()
                     self._save_session()
                     self._log('a friend ' + str(friend_id) + ' added successfully')
                     return True
@@ -154,6 +213,7 @@ class SkynetBot:
         timeout = self._actions_periods[action_name]
         return now - self._actions_timestamps[action_name] >= timeout
 
+    @timed_action
     def check_friends(self):
         """
         Check the income friendship quotes and accept one
@@ -162,15 +222,12 @@ class SkynetBot:
         """
         self._log('run check_friends')
         if self._open_main_page():
-            time.sleep(3)
             r = self._get('https://vk.com/friends?section=requests')
-            buttons = re.findall(
-                '<button([^>]*)accept_request_([0-9]+)([^>]*)Friends.acceptRequest\(([0-9]+), \'([^>]*)\', this\)">Добавить в друзья</button>',
-                r.text)
-            if not len(buttons):
+            requests_list = vk_responses.find_friend_requests(r.text)
+            if not len(requests_list):
                 self._log('check_friends completed successfully, accepted %d' % 0)
                 return True
-            html_trash, friend_id, html_trash, html_trash, friend_hash = buttons[0]
+            friend_id, friend_hash = requests_list[0]
 
             params = {
                 'act': 'add',
@@ -181,10 +238,11 @@ class SkynetBot:
                 'select_list': 1
             }
 
-            time.sleep(3)
             r = self._post('https://vk.com/al_friends.php', data=params)
 
-            if re.match('(.*)у Вас в друзьях(.*)', r.text):
+            result = vk_responses.parse_action_response(r.text, vk_responses.MARKER_FRIEND_ADDED)
+            if result.status == vk_responses.STATUS_OK:
+                self._page_cache.invalidate()
                 self._save_session()
                 self._log('check_friends completed successfully, accepted %d' % 1)
                 return True
@@ -192,6 +250,57 @@ class SkynetBot:
         self._log('error: check_friends')
         return False
 
+    def clear_page_cache(self):
+        """
+        Forget the pages downloaded during the previous cycle and free their trees
+        :return: bool
+
+        """
+        return self._page_cache.release()
+
+    def close(self):
+        """
+        Save the cookies that are still unsaved, release the HTTP session
+        and the post store
+        :return: bool
+
+        """
+        if self._session is not None:
+            self._session_store.save(self._session.cookies, force=True)
+            self._session.close()
+            self._session = None
+        if self._post_store is not None:
+            self._post_store.close()
+            self._post_store = None
+        self._page_cache.release()
+        return True
+
+    def get_action_policies(self):
+        """
+        The schedule of the bot actions, the most important first
+
+        Reposts that did not happen are retried in a minute, other actions
+        wait for their whole period whatever the result. A successful action
+        ends the cycle, except get_online that runs along with the others.
+        :return: list of ActionPolicy
+
+        """
+        periods = self._actions_periods
+        day = self._actions_hours['day']
+        return [
+            ActionPolicy(self.ACTION_REPOST_RANDOM, 'repost_random_post', periods[self.ACTION_REPOST_RANDOM], 0, day,
+                         retry_after=60),
+            ActionPolicy(self.ACTION_REPOST_OUR, 'repost_our_post', periods[self.ACTION_REPOST_OUR], 1, day,
+                         retry_after=60),
+            ActionPolicy(self.ACTION_ADD_FRIEND, 'add_friend', periods[self.ACTION_ADD_FRIEND], 2, day),
+            ActionPolicy(self.ACTION_CHECK_FRIENDS, 'check_friends', periods[self.ACTION_CHECK_FRIENDS], 3, day),
+            ActionPolicy(self.ACTION_SEND_STAT, 'send_stat', periods[self.ACTION_SEND_STAT], 4,
+                         self._actions_hours['stat']),
+            ActionPolicy(self.ACTION_VISIT_GROUP, 'visit_group', periods[self.ACTION_VISIT_GROUP], 5, day),
+            ActionPolicy(self.ACTION_ONLINE, 'get_online', periods[self.ACTION_ONLINE], 6, day, exclusive=False),
+        ]
+
+    @timed_action
     def get_online(self):
         """
         Open the profile page to refresh online status
@@ -200,9 +309,8 @@ class SkynetBot:
         """
         self._log('run get_online')
         if self._open_main_page():
-            time.sleep(3)
             r = self._get('https://vk.com/id'+self.vk_id)
-            if r.status_code == 200:
+            if r.status_code == 200 and self._session_state.is_verified():
                 self._save_session()
                 self._log('status online updated sucessfully')
                 return True
@@ -210,6 +318,7 @@ class SkynetBot:
         self._log('error: get_online')
         return False
 
+    @timed_action
     def repost_our_post(self):
         """
         Check if there is a new post in our group post it
@@ -221,28 +330,26 @@ class SkynetBot:
         if not self._open_main_page():
             return False
 
-        time.sleep(3)
-        r = self._get('https://vk.com/id' + self.vk_id)
-        if r.status_code != 200:
-            return False
-
-        last_bot_post_age = self._get_bot_last_post_age(r)
+        last_bot_post_age = self._get_bot_last_post_age()
         now = time.time()
-        if now - last_bot_post_age < self._reposts_min_periods['our_post']:
+        if last_bot_post_age is None or now - last_bot_post_age < self._reposts_min_periods['our_post']:
             return False
 
         last_my_group_post = self._get_last_my_group_post()
+        if not last_my_group_post or not last_my_group_post.key:
+            return False
         already_reposted = self._check_post_already_reposted_by_bot(last_my_group_post)
         if already_reposted:
             return True
 
         last_bot_post = self._get_last_bot_post()
-        if last_bot_post and last_bot_post['copy_author_link'] == '/buzovaofficial':
+        if last_bot_post and last_bot_post.copy_author_link == '/buzovaofficial':
             self.repost_random_post(self._reposts_min_periods['our_post'])
         else:
             self._repost_post(last_my_group_post)
         return False
 
+    @timed_action
     def repost_random_post(self, interval=_reposts_min_periods['random_post']):
         """
         Repost a new post from _groups_list it with interval
@@ -253,20 +360,25 @@ class SkynetBot:
         if not self._open_main_page():
             return False
 
-        time.sleep(3)
-        r = self._get('https://vk.com/id' + self.vk_id)
-        if r.status_code != 200:
-            return False
-
-        last_bot_post_age = self._get_bot_last_post_age(r)
+        last_bot_post_age = self._get_bot_last_post_age()
         now = time.time()
-        if now - last_bot_post_age < interval:
+        if last_bot_post_age is None or now - last_bot_post_age < interval:
             return False
 
         best_post = self._find_best_random_post()
+        if not best_post:
+            return False
         result = self._repost_post(best_post)
         return result
 
+    def get_metrics(self):
+        """
+        Request, parsing and action metrics of the bot
+        :rtype: Metrics
+
+        """
+        return self._metrics
+
     def get_session(self):
         """
         The current Requests.session() getter
@@ -277,6 +389,7 @@ class SkynetBot:
             self._session = self._init_session()
         return self._session
 
+    @timed_action
     def send_stat(self):
         """
         Send a message with the current account parameters
@@ -285,31 +398,29 @@ class SkynetBot:
         """
         self._log('run send_stat')
         if self._open_main_page():
-            time.sleep(3)
             r = self._get('https://vk.com/id' + self.admin_vk_id)
             if r.status_code == 200:
-                try:
-                    admin_hash = re.search('\\\\n    hash: \'([^\']+)\',\\\\n', r.text).group(1)
-                    stat = self._collect_stat()
-                    params = {
-                        'act': 'a_send_box',
-                        'al': 1,
-                        'chas': admin_hash,
-                        'entrypoint': 'writebox',
-                        'from': 'box',
-                        'media': '',
-                        'message': 'Привет! ' + '/'.join(stat),
-                        'title': '',
-                        'to_ids': self.admin_vk_id
-                    }
-                    r = self._post('https://vk.com/al_im.php', data=params, allow_redirects=True)
-                    if r.status_code == 200:
-                        self._log('success: send_stat')
-                        return True
-                    return False
-                except AttributeError:
+                admin_hash = vk_responses.find_admin_hash(r.text)
+                if not admin_hash:
                     self._log('error: send_stat')
                     return False
+                stat = self._collect_stat()
+                params = {
+                    'act': 'a_send_box',
+                    'al': 1,
+                    'chas': admin_hash,
+                    'entrypoint': 'writebox',
+                    'from': 'box',
+                    'media': '',
+                    'message': 'Привет! ' + '/'.join(stat),
+                    'title': '',
+                    'to_ids': self.admin_vk_id
+                }
+                r = self._post('https://vk.com/al_im.php', data=params, allow_redirects=True)
+                if r.status_code == 200:
+                    self._log('success: send_stat')
+                    return True
+                return False
 
         self._log('error: send_stat _open_main_page')
         return False
@@ -329,6 +440,7 @@ class SkynetBot:
         self._actions_timestamps[action_name] = time.time()
         return True
 
+    @timed_action
     def visit_group(self):
         """
         Just visit a group
@@ -338,7 +450,7 @@ class SkynetBot:
         self._log('run visit_group')
         if self._open_main_page():
             r = self._get(self.vk_my_group)
-            if r.status_code == 200:
+            if r.status_code == 200 and self._session_state.is_verified():
                 self._log('success: visit_group')
                 return True
         self._log('error: visit_group')
@@ -350,39 +462,38 @@ class SkynetBot:
     """
 
     def _collect_stat(self):
+        # send_stat has opened the main page already
         stat = []
-        if self._open_main_page():
-            time.sleep(3)
-            r = self._get('https://vk.com/id'+self.vk_id)
-            if r.status_code == 200:
-                try:
-                    soup = BeautifulSoup(r.text, "html.parser")
-
-                    friends_count = '0'
-                    friends_wrapper = soup.select_one('#profile_friends .header_count')
-                    if friends_wrapper:
-                        friends_count = friends_wrapper.getText()
-                    stat.append(friends_count)
-
-                    incoming_requests_count = '0'
-                    incoming_wrapper = soup.select_one('#l_fr .left_count')
-                    if incoming_wrapper:
-                        incoming_requests_count = incoming_wrapper.getText()
-                    stat.append(incoming_requests_count)
-
-                    messages_count = '0'
-                    messages_wrapper = soup.select_one('#l_msg .left_count')
-                    if messages_wrapper:
-                        messages_count = messages_wrapper.getText()
-                    stat.append(messages_count)
-                except:
-                    pass
+        r, soup = self._get_profile_page(SCOPE_COUNTERS)
+        if r.status_code == 200:
+            try:
+                friends_count = '0'
+                friends_wrapper = soup.select_one('#profile_friends .header_count')
+                if friends_wrapper:
+                    friends_count = friends_wrapper.getText()
+                stat.append(friends_count)
+
+                incoming_requests_count = '0'
+                incoming_wrapper = soup.select_one('#l_fr .left_count')
+                if incoming_wrapper:
+                    incoming_requests_count = incoming_wrapper.getText()
+                stat.append(incoming_requests_count)
+
+                messages_count = '0'
+                messages_wrapper = soup.select_one('#l_msg .left_count')
+                if messages_wrapper:
+                    messages_count = messages_wrapper.getText()
+                stat.append(messages_count)
+            except:
+                pass
 
         return stat
 
     def _change_language(self, response):
+        my_hash = vk_responses.find_language_hash(response.text)
+        if not my_hash:
+            return False
         try:
-            my_hash = re.search('lang_id: 0, hash: \'([^\']+)\'}', response.text).group(1)
             params = {
                 'act': 'change_lang',
                 'al': 1,
@@ -391,107 +502,194 @@ class SkynetBot:
             }
             r = self._post('https://vk.com/al_index.php', data=params, allow_redirects=True)
             if r.status_code == 200:
+                self._page_cache.invalidate()
                 return True
         except:
             pass
         return False
 
+    def _check_logged_out(self, url, content):
+        """
+        Stop trusting the login once a vk.com answer shows the login form
+        :param url: str
+        :param content: bytes response body
+        :return: bool True if the session turned out to be logged out
+
+        """
+        if not url.startswith('https://vk.com') or not vk_responses.is_login_page(content):
+            return False
+        if self._session_state.invalidate():
+            self._log('the session is logged out, the next action logs in again', WARNING)
+            self._metrics.inc('vk_session_checks_total', result='logged_out')
+        return True
+
     def _check_post_already_reposted_by_bot(self, post):
         self._log('run _check_post_already_reposted_by_bot')
+        if self._wall_api is not None:
+            my_posts = self._get_own_wall_posts()
+            return my_posts is not None and post.key in build_reposted_index(my_posts)
 
         try:
-            time.sleep(3)
-            r = self._get('https://vk.com/id' + self.vk_id)
-            soup = BeautifulSoup(r.text, "html.parser")
+            r, soup = self._get_profile_page(SCOPE_WALL)
             my_posts = soup.select('.wall_posts .post.own')
         except Exception as e:
             return False
 
-        group_post_id = post['id'].replace('post', '').replace('-', '')
-        for my_post in my_posts:
-            my_post = self._parse_wall_post(my_post)
-            if my_post['original_id'] is None:
+        reposted = build_reposted_index(self._parse_wall_post(my_post) for my_post in my_posts)
+        return post.key in reposted
+
+    def _crawl_groups(self):
+        """
+        Add the new posts of every group wall to the post store
+        :return: int number of new posts
+
+        """
+        self._log('run _crawl_groups')
+        if self._wall_api is not None:
+            walls = self._fetch_api_walls(groups)
+            return sum(self._crawl_api_wall(group, posts) for group, posts in walls.items())
+
+        store = self._get_post_store()
+        stop_markers = {}
+        for group in groups:
+            high_water_mark = store.get_high_water_mark(group)
+            if high_water_mark:
+                stop_markers[group] = (post_marker(high_water_mark),)
+
+        new_posts = 0
+        for group, soup in self._fetch_walls(groups, stop_markers):
+            try:
+                new_posts += self._crawl_wall(group, soup.select('.post.own'))
+            except Exception as e:
                 continue
-            my_post_id = my_post['original_id'].replace('post', '').replace('-', '')
-            if my_post_id == group_post_id:
-                return True
+            finally:
+                self._release_wall(soup)
+        return new_posts
 
-        return False
+    def _crawl_wall(self, wall, posts):
+        """
+        Parse and store the posts above the wall's high-water mark
+
+        The crawl stops at the first post that is already in the store, so
+        only new posts are parsed. Pinned posts stay on top whatever their
+        age and neither stop the crawl nor become the high-water mark.
+        :param wall: str
+        :param posts: list of '.post.own' elements, the newest first
+        :return: int number of new posts
+
+        """
+        entries = ((parse_post_key(post.get('id')), 'post_fixed' in post.get('class'), post) for post in posts)
+        return self._store_new_posts(wall, entries, self._parse_crawled_post)
+
+    def _crawl_api_wall(self, wall, posts):
+        """
+        _crawl_wall of a wall read through the API
+        :param wall: str
+        :param posts: list of PostRecord, the newest first
+        :return: int number of new posts
+
+        """
+        entries = ((post.key, post.pinned, post) for post in posts)
+        return self._store_new_posts(wall, entries, lambda post: None if post.original_key else post)
 
     def _find_best_random_post(self):
         self._log('run _find_best_random_post')
-        all_random_posts = self._get_all_random_posts()
+        self._crawl_groups()
+        store = self._get_post_store()
+        now = time.time()
+        store.prune(now - self._random_posts_max_ages['stored'])
+        candidates = store.get_candidate_rows(now - self._random_posts_max_ages['candidate'])
         all_skynet_bots_posts = self._get_all_skynet_bots_posts()
 
-        new_random_posts = []
-        for random_post in all_random_posts:
-            random_post_id = random_post['id'].replace('post', '').replace('-', '')
-            already_reposted = False
-            for skynet_bot_post in all_skynet_bots_posts:
-                if not skynet_bot_post['original_id']:
-                    continue
-                bot_post_id = skynet_bot_post['original_id'].replace('post', '').replace('-', '')
-                if bot_post_id == random_post_id:
-                    already_reposted = True
-            if not already_reposted:
-                new_random_posts.append(random_post)
-
-        result = sorted(new_random_posts, key=lambda k: k['rating'], reverse=True)
-        result = result[:30]
-        result = random.choice(result)
-        return result
+        reposted = build_reposted_index(all_skynet_bots_posts)
+        # only the picked post becomes a record
+        best = self._scorer.top(candidates, self._random_posts_top, now, exclude=reposted)
+        if not best:
+            return None
 
-    def _get(self, *args, **kwargs):
-        try:
-            result = self.get_session().get(*args, **kwargs)
-        except BrokenPipeError:
-            self._log('BrokenPipeError, reinit session')
-            self._init_session()
-            result = self.get_session().get(*args, **kwargs)
+        result = record_from_row(random.choice(best))
         return result
 
-    def _get_all_random_posts(self):
-        self._log('run _get_all_random_posts')
-        all_random_posts = []
-        for group in groups:
+    def _fetch_api_walls(self, urls, count=None):
+        """
+        Read the posts of walls through the API, many walls per request
+        :param urls: iterable of str
+        :param count: int posts of every wall, WallApi.count by default
+        :return: dict of url: list of PostRecord, walls that could not be read are left out
+
+        """
+        result = {}
+        for batch in self._wall_api.get_batches(urls):
             try:
-                time.sleep(3)
-                r = self._get(group)
-                soup = BeautifulSoup(r.text, "html.parser")
-                posts = soup.select('.post.own')
-                for post in posts:
-                    if not 'post_copy' in post.get('class') and not post.select_one('.wall_marked_as_ads'):
-                        all_random_posts.append(post)
+                # sent as a form, a query string with the token would end up in the errors and the log
+                r = self._post(EXECUTE_URL, data=self._wall_api.get_execute_params(batch, count))
+                walls = self._wall_api.parse_execute_response(batch, r.json())
             except Exception as e:
+                self._log('error: wall api %s' % self._wall_api.scrub(str(e)), WARNING)
+                self._metrics.inc('vk_api_walls_total', len(batch), result='error')
                 continue
-
-        result = []
-        for post in all_random_posts:
-            result.append(self._parse_wall_post(post))
+            for error in walls.errors:
+                self._log('error: wall api ' + error, WARNING)
+            self._metrics.inc('vk_api_walls_total', len(walls.posts), result='ok')
+            self._metrics.inc('vk_api_walls_total', len(batch) - len(walls.posts), result='error')
+            result.update(walls.posts)
         return result
 
-    def _get_all_skynet_bots_posts(self):
-        self._log('run _get_all_skynet_bots_posts')
-        all_skynet_bots_posts = []
-        for bot_page in bots:
+    def _fetch_walls(self, urls, stop_markers=None):
+        """
+        Download and parse the posts lists of walls one by one
+
+        The pacer lets one request out at a time anyway, so the walls are
+        read in order and the next one only when the caller asks for it.
+        Every wall is read up to its end or up to its own stop markers; an
+        HttpCache reads it whole and the caller stops at its markers.
+        Walls that failed to download are skipped.
+        :param urls: iterable of str
+        :param stop_markers: dict of url: tuple of extra stop markers
+        :return: generator of (url, BeautifulSoup)
+
+        """
+        stop_markers = stop_markers or {}
+        for url in urls:
             try:
-                time.sleep(3)
-                r = self._get(bot_page)
-                soup = BeautifulSoup(r.text, "html.parser")
-                posts = soup.select('.wall_posts .post.own')
-                for post in posts:
-                    all_skynet_bots_posts.append(post)
+                soup = self._get_wall(url, stop_markers=WALL_END_MARKERS + stop_markers.get(url, ()))
             except Exception as e:
                 continue
+            yield url, soup
+
+    def _get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
 
+    def _get_all_skynet_bots_posts(self):
+        self._log('run _get_all_skynet_bots_posts')
+        if self._wall_api is not None:
+            return [post for posts in self._fetch_api_walls(bots).values() for post in posts]
+
+        # _fetch_walls parses the next wall only when it is asked for and this one is released before,
+        # so one tree is alive at a time; with an HttpCache the trees stay in its documents instead
         result = []
-        for post in all_skynet_bots_posts:
-            result.append(self._parse_wall_post(post))
+        for bot_page, soup in self._fetch_walls(bots):
+            for post in soup.select('.wall_posts .post.own'):
+                result.append(self._parse_wall_post(post))
+            self._release_wall(soup)
         return result
 
-    def _get_bot_last_post_age(self, response):
+    def _get_bot_last_post_age(self):
+        """
+        :return: float timestamp of the bot's last repost, 0 if it is unknown,
+            None if the bot's wall could not be read
+
+        """
+        if self._wall_api is not None:
+            my_posts = self._get_own_wall_posts()
+            if my_posts is None:
+                return None
+            return next((post.date for post in my_posts if post.original_key), 0)
+
+        r, soup = self._get_profile_page(SCOPE_WALL)
+        if r.status_code != 200:
+            return None
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
             last_post = soup.select_one('.post.own.post_copy')
 
             if not last_post:
@@ -504,24 +702,158 @@ class SkynetBot:
         return 0
 
     def _get_last_bot_post(self):
+        if self._wall_api is not None:
+            my_posts = self._get_own_wall_posts()
+            return my_posts[0] if my_posts else None
+
         try:
-            time.sleep(3)
-            r = self._get('https://vk.com/id' + self.vk_id)
-            soup = BeautifulSoup(r.text, "html.parser")
+            r, soup = self._get_profile_page(SCOPE_WALL)
             my_post = soup.select_one('.wall_posts .post.own')
         except Exception as e:
             return None
+        if not my_post:
+            return None
 
         my_post = self._parse_wall_post(my_post)
         return my_post
 
     def _get_last_my_group_post(self):
-        r = self._get(self.vk_my_group)
-        soup = BeautifulSoup(r.text, "html.parser")
+        if self._wall_api is not None:
+            posts = self._fetch_api_walls([self.vk_my_group], count=1).get(self.vk_my_group)
+            return posts[0] if posts else None
+
+        soup = self._get_wall(self.vk_my_group, max_posts=1)
         post = soup.select_one('.wall_posts .post.own')
-        post = self._parse_wall_post(post)
+        if post:
+            post = self._parse_wall_post(post)
+        self._release_wall(soup)
         return post
 
+    def _get_own_wall_posts(self):
+        """
+        The posts of the bot's wall read through the API, at most once per cycle
+        like the profile page
+        :return: list of PostRecord, the newest first, or None if the wall could not be read
+
+        """
+        url = 'https://vk.com/id' + self.vk_id
+        key = EXECUTE_URL + '#' + url
+        posts = self._page_cache.get(key)
+        if posts is None:
+            posts = self._fetch_api_walls([url]).get(url)
+            if posts is not None:
+                self._page_cache.set(key, posts)
+        return posts
+
+    def _get_page(self, url, scope=None, stop_markers=None):
+        """
+        Download and parse a page at most once per cycle
+
+        Only successful responses are cached, a cache hit skips both the
+        request pause and the parsing.
+        :param url: str
+        :param scope: parse scope of page_parser, None for the whole page
+        :param stop_markers: tuple of str to download the page only up to them
+        :return: (Response, BeautifulSoup)
+
+        """
+        r = self._page_cache.get(url)
+        if r is None:
+            if stop_markers:
+                r = self._get_streamed(url, stop_markers=stop_markers)
+            else:
+                r = self._get(url)
+            if r.status_code != 200:
+                return r, self._parse_page(r.text, scope)
+            self._page_cache.set(url, r)
+
+        soup = self._page_cache.get_document(url, scope)
+        if soup is None:
+            soup = self._parse_page(r.text, scope)
+            self._page_cache.set_document(url, scope, soup)
+        return r, soup
+
+    def _get_profile_page(self, scope=None):
+        """
+        The bot's own page, downloaded up to the end of its wall
+        :param scope: parse scope of page_parser
+        :return: (Response, BeautifulSoup)
+
+        """
+        return self._get_page('https://vk.com/id' + self.vk_id, scope, WALL_END_MARKERS)
+
+    def _get_normalizer(self):
+        if self._normalizer is None or not self._normalizer.is_current():
+            self._normalizer = PostMetaNormalizer()
+        return self._normalizer
+
+    def _get_post_store(self):
+        if self._post_store is None:
+            self._post_store = PostStore()
+        return self._post_store
+
+    def _get_streamed(self, url, max_posts=None, stop_markers=WALL_END_MARKERS):
+        """
+        Download a wall page only up to what is needed
+
+        The connection is closed after max_posts posts or at the first
+        stop marker, the rest of the page is never transferred.
+        :param url: str
+        :param max_posts: int or None
+        :param stop_markers: tuple of str
+        :return: Response with the truncated body
+
+        """
+        r = self._get(url, stream=True)
+        received = read_page(r, max_posts, stop_markers)
+        self._metrics.inc('vk_response_bytes_total', received, method='GET', endpoint=endpoint_label(url))
+        self._check_logged_out(url, r.content)
+        return r
+
+    def _get_wall(self, url, max_posts=None, stop_markers=WALL_END_MARKERS):
+        """
+        The parsed posts list of someone else's wall
+
+        With an HttpCache a fresh cached copy is used without a request and
+        a stale one is revalidated; a page that did not change is not parsed
+        again either. The cache keeps the whole wall under its URL, read up
+        to WALL_END_MARKERS whatever max_posts and stop_markers ask for; the
+        crawl stops at its high-water mark while taking the posts out.
+        Without it the wall is downloaded every time.
+        :param url: str
+        :param max_posts: int or None
+        :param stop_markers: tuple of str
+        :return: BeautifulSoup
+
+        """
+        if self._http_cache is None:
+            r = self._get_streamed(url, max_posts, stop_markers)
+            return self._parse_page(r.text, SCOPE_WALL)
+
+        page = self._http_cache.get(url)
+        if page is not None and self._http_cache.is_fresh(page):
+            self._metrics.inc('vk_http_cache_total', result='hit')
+        else:
+            r = self._get(url, stream=True, headers=self._http_cache.get_conditional_headers(page))
+            if r.status_code == 304 and page is not None:
+                r.close()
+                page = self._http_cache.revalidated(page, r)
+                self._metrics.inc('vk_http_cache_total', result='revalidated')
+            else:
+                received = read_page(r, None, WALL_END_MARKERS)
+                self._metrics.inc('vk_response_bytes_total', received, method='GET', endpoint=endpoint_label(url))
+                self._metrics.inc('vk_http_cache_total', result='miss')
+                # a guest copy of the wall is not kept, it would be served as a good one until it expires
+                if self._check_logged_out(url, r.content) or r.status_code != 200:
+                    return self._parse_page(r.text, SCOPE_WALL)
+                page = self._http_cache.store(url, r)
+
+        soup = self._http_cache.get_document(page, SCOPE_WALL)
+        if soup is None:
+            soup = self._parse_page(page.text, SCOPE_WALL)
+            self._http_cache.set_document(page, SCOPE_WALL, soup)
+        return soup
+
     def _init_session(self):
         self._session = None
         headers = {
@@ -538,28 +870,19 @@ class SkynetBot:
                 f.write(user_agent)
         headers['user-agent'] = user_agent
 
-        self._session = requests.session()
+        self._session = transport.create_session()
         self._session.headers.update(headers)
-        os.makedirs(os.path.dirname('tmp/vk_cookies.out'), exist_ok=True)
-        try:
-            with open('tmp/vk_cookies.out', 'rb') as f:
-                cookies = pickle.load(f)
-                cookies = requests.utils.cookiejar_from_dict(cookies)
-                self._session.cookies = cookies
-        except IOError:
-            pass
-
+        self._session_store.load(self._session.cookies)
         return self._session
 
-    def _log(self, msg):
+    def _log(self, msg, level=INFO):
         if self._logger:
-            self._logger.log(msg)
+            self._logger.log(msg, level)
             return True
         return False
 
-    def _login(self, response):
+    def _login(self, soup):
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
             ip_h = soup.find('input', {'name': 'ip_h'}).get('value')
             lg_h = soup.find('input', {'name': 'lg_h'}).get('value')
 
@@ -573,7 +896,6 @@ class SkynetBot:
                 'pass': self.vk_password
             }
 
-            time.sleep(3)
             r = self._post('https://login.vk.com/', data=params, allow_redirects=False)
             location = r.headers['location']
 
@@ -586,21 +908,19 @@ class SkynetBot:
                     return False
                 params['recaptcha'] = captcha_response
 
-                time.sleep(3)
                 r = self._post('https://login.vk.com/', data=params, allow_redirects=False)
                 location = r.headers['location']
                 parsed_location = urllib.parse.urlparse(location)
                 parsed_location = urllib.parse.parse_qs(parsed_location.query)
 
             if '__q_hash' in parsed_location:
-                time.sleep(3)
                 r = self._get(location)
 
-                try:
-                    self.vk_id = re.search('"uid":"([0-9]+)"', r.text).group(1)
-                except AttributeError:
-                    pass
-                self._save_session()
+                vk_id = vk_responses.find_uid(r.text)
+                if vk_id:
+                    self.vk_id = vk_id
+                self._page_cache.invalidate()
+                self._save_session(force=True)
                 return True
             else:
                 return False
@@ -609,9 +929,8 @@ class SkynetBot:
             pass
         return False
 
-    def _needs_change_language(self, response):
+    def _needs_change_language(self, soup):
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
             html = soup.find(name="html", attrs={'lang': 'ru'})
             if html:
                 return False
@@ -619,9 +938,8 @@ class SkynetBot:
         except Exception as e:
             return True
 
-    def _needs_login(self, response):
+    def _needs_login(self, soup):
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
             ip_h = soup.find('input', {'name': 'ip_h'}).get('value')
             lg_h = soup.find('input', {'name': 'lg_h'}).get('value')
             return True
@@ -629,124 +947,119 @@ class SkynetBot:
             return False
 
     def _open_main_page(self):
+        """
+        Make sure the session is logged in, logging in if it is not
+
+        The main page is opened only when the session was not seen logged
+        in for a while, see SessionState.
+        :return: bool
+
+        """
         self._log('run _open_main_page')
-        time.sleep(3)
-        r = self._get('https://vk.com/')
-        if self._needs_login(r):
-            if self._needs_change_language(r):
+        if self._session_state.is_verified():
+            self.vk_id = self._session_state.vk_id
+            self._metrics.inc('vk_session_checks_total', result='cached')
+            return True
+
+        r, soup = self._get_page('https://vk.com/')
+        if self._needs_login(soup):
+            self._page_cache.invalidate()
+            if self._needs_change_language(soup):
                 self._change_language(r)
-                r = self._get('https://vk.com/')
-            if not self._login(r):
+                r, soup = self._get_page('https://vk.com/')
+                self._page_cache.invalidate()
+            if not self._login(soup):
                 return False
-            time.sleep(3)
-            r = self._get('https://vk.com/')
+            r, soup = self._get_page('https://vk.com/')
 
         if r.status_code == 200:
-            try:
-                self.vk_id = re.search(r',\n  id: ([0-9]+)', r.text, re.M).group(1)
+            vk_id = vk_responses.find_vk_id(r.text)
+            if vk_id:
+                self.vk_id = vk_id
+                self._session_state.verify(vk_id)
+                self._metrics.inc('vk_session_checks_total', result='verified')
                 return True
-            except AttributeError:
-                pass
 
         return False
 
-    def _parse_int_from_human_number(self, number):
-        if number == '':
-            return 0
-        result = float(re.search(r'[\d\.]+', number).group())
-        if 'K' in number:
-            result = result * 1000
-        if 'M' in number:
-            result = result * 1000000
-        if 'B' in number:
-            result = result * 1000000000
-        return result
+    def _parse_page(self, markup, scope=None):
+        started = time.perf_counter()
+        soup = parse_page(markup, scope)
+        self._metrics.observe('vk_parse_seconds', time.perf_counter() - started, scope=scope or 'page')
+        return soup
 
     def _parse_wall_post(self, post):
-        result = {
-            'rating': 0
-        }
+        result = PostRecord()
         try:
-            result['id'] = post.get('id')
-            result['original_id'] = post.get('data-copy')
-            result['view_hash'] = post.get('post_view_hash'),
-            result['author_name'] = post.select_one('.post_author > a.author').getText()
-            result['author_link'] = post.select_one('.post_author > a.author').get('href')
-            try:
-                result['copy_author_name'] = post.select_one('.copy_post_author > a.copy_author').getText()
-                result['copy_author_link'] = post.select_one('.copy_post_author > a.copy_author').get('href')
-            except Exception:
-                result['copy_author_name'] = None
-                result['copy_author_link'] = None
-            result['date'] = self._parse_wall_post_date(post)
-            result['likes'] = post.select_one('.post_like_count._count').getText()
-            result['reposts'] = post.select_one('.post_share_count._count').getText()
-            result['views'] = post.select_one('.post_views_count._count').getText()
-
-            result['likes'] = self._parse_int_from_human_number(result['likes'])
-            result['reposts'] = self._parse_int_from_human_number(result['reposts'])
-            result['views'] = self._parse_int_from_human_number(result['views'])
-
-            result['rating'] = (result['likes'] + result['reposts']) / result['views'] * 100
+            key = parse_post_key(post.get('id'))
+            if key:
+                result.owner_id, result.post_id = key
+            result.original_key = parse_post_key(post.get('data-copy'))
+            result.view_hash = post.get('post_view_hash')
+            result.pinned = 'post_fixed' in (post.get('class') or ())
+            author = post.select_one('.post_author > a.author')
+            result.author_name = author.getText()
+            result.author_link = author.get('href')
+            copy_author = post.select_one('.copy_post_author > a.copy_author')
+            if copy_author:
+                result.copy_author_name = copy_author.getText()
+                result.copy_author_link = copy_author.get('href')
+            result.date = self._parse_wall_post_date(post)
+            likes = post.select_one('.post_like_count._count').getText()
+            reposts = post.select_one('.post_share_count._count').getText()
+            views = post.select_one('.post_views_count._count').getText()
+
+            normalizer = self._get_normalizer()
+            result.likes = normalizer.parse_count(likes)
+            result.reposts = normalizer.parse_count(reposts)
+            result.views = normalizer.parse_count(views)
+
+            if result.views:
+                result.rating = (result.likes + result.reposts) / result.views * 100
         except Exception as e:
             pass
         return result
 
     def _parse_wall_post_date(self, post):
-        try:
-            post_date = post.select_one('.post_header .post_date').getText()
-            if "год" in post_date or "года" in post_date or "лет" in post_date:
-                return 0
-
-            if "назад" in post_date:
-                return time.time()
+        """
+        :param post: post element of a wall
+        :return: float timestamp, 0 if the post has no date of a known form
 
-            post_date = post_date.split(' в ')
-            post_date = {
-                'date': post_date[0],
-                'time': post_date[1]
-            }
-            if post_date['date'] == 'сегодня':
-                post_date['date'] = datetime.datetime.now().strftime("%d-%m-%Y")
-            elif post_date['date'] == 'вчера':
-                post_date['date'] = datetime.datetime.now() - datetime.timedelta(days=1)
-                post_date['date'] = post_date['date'].strftime("%d-%m-%Y")
-            else:
-                post_date['date'] = post_date['date'].split(' ')
-                post_date['date'][1] = months[post_date['date'][1]]
-                if len(post_date['date']) == 2:
-                    post_date['date'].append(str(datetime.datetime.now().year))
-                post_date['date'] = '-'.join(str(v) for v in post_date['date'])
-
-            post_date_string = post_date['date'] + ' ' + post_date['time']
-            post_date = datetime.datetime.strptime(post_date_string, '%d-%m-%Y %H:%M')
-            return post_date.timestamp()
-        except Exception as e:
-            self._log('exception in _parse_wall_post_date. post_date=' + str(post_date) + ' ' + str(e).encode().decode("utf-8"))
+        """
+        post_date = post.select_one('.post_header .post_date')
+        if post_date is None:
             return 0
+        return self._get_normalizer().parse_date(post_date.getText())
 
-    def _post(self, *args, **kwargs):
-        try:
-            result = self.get_session().post(*args, **kwargs)
-        except BrokenPipeError:
-            self._log('BrokenPipeError, reinit session')
-            self._init_session()
-            result = self.get_session().post(*args, **kwargs)
-        return result
+    def _parse_crawled_post(self, post):
+        if 'post_copy' in post.get('class') or post.select_one('.wall_marked_as_ads'):
+            return None
+        return self._parse_wall_post(post)
+
+    def _post(self, url, **kwargs):
+        return self._request('POST', url, **kwargs)
+
+    def _release_wall(self, soup):
+        """
+        Free the tree of a wall read by _get_wall once its posts are taken
+        out of it, unless the HttpCache keeps it for the next read
+        :param soup: BeautifulSoup
+
+        """
+        if self._http_cache is None:
+            release_document(soup)
 
     def _repost_post(self, post):
-        post_id = 'wall'+post['id'].replace('post', '')
+        post_id = post.wall_object
         params = {
             'act': 'publish_box',
             'al': 1,
             'object': post_id
         }
-        time.sleep(3)
         r = self._post('https://vk.com/like.php', data=params)
 
-        try:
-            share_hash = re.search('shHash: \'([^\']+)\'', r.text).group(1)
-        except AttributeError:
+        share_hash = vk_responses.find_share_hash(r.text)
+        if not share_hash:
             return False
 
         params = {
@@ -758,26 +1071,85 @@ class SkynetBot:
             'object': post_id,
             'to': 0
         }
-        time.sleep(3)
         r = self._post('https://vk.com/like.php', data=params)
 
-        if re.match('(.*)Запись отправлена', r.text):
+        result = vk_responses.parse_action_response(r.text, vk_responses.MARKER_POST_SHARED)
+        if result.status == vk_responses.STATUS_OK:
+            self._page_cache.invalidate()
             self._save_session()
-            self._log('a post ' + str(post['id']) + ' reposted successfully')
+            self._get_post_store().mark_reposted(post.key)
+            self._log('a post ' + post_id + ' reposted successfully')
             return True
 
         return False
 
-    def _save_session(self):
-        os.makedirs(os.path.dirname('tmp/vk_cookies.out'), exist_ok=True)
-        with open('tmp/vk_cookies.out', 'wb+') as f:
-            f.truncate()
-            cookies = requests.utils.dict_from_cookiejar(self.get_session().cookies)
-            pickle.dump(cookies, f)
-        return True
+    def _request(self, method, url, **kwargs):
+        """
+        Send a paced request through the session and record its metrics
+
+        GET requests are retried by the session itself. Any other request
+        that failed before reaching vk.com is sent once more on a new
+        session. A streamed response is counted here without its body,
+        the bytes are added by whoever reads it, and so is looked at for a
+        logout.
+        :param method: str
+        :param url: str
+        :return: Response
+
+        """
+        self._metrics.observe('vk_pacer_wait_seconds', self._pacer.acquire())
+        labels = {'method': method, 'endpoint': endpoint_label(url)}
+        requested_url = url
+        if self._hosts:
+            url = self._rewrite_host(url)
+        started = time.perf_counter()
+        try:
+            try:
+                result = self.get_session().request(method, url, **kwargs)
+            except (requests.exceptions.RequestException, ConnectionError) as e:
+                error = transport.classify_error(e)
+                if method == 'GET' or error not in transport.RESENDABLE_ERRORS:
+                    raise
+                self._log('%s error on %s %s, reinit session' % (error, method, url), WARNING)
+                self._metrics.inc('vk_request_errors_total', error=error, **labels)
+                # the new session loads the cookies from disk, the store may not have the latest ones yet
+                self._save_session(force=True)
+                self._session.close()
+                self._init_session()
+                result = self.get_session().request(method, url, **kwargs)
+        except Exception as e:
+            self._metrics.inc('vk_request_errors_total', error=transport.classify_error(e), **labels)
+            self._log('%s error on %s %s: %s' % (transport.classify_error(e), method, url, e), WARNING)
+            raise
+        self._metrics.observe('vk_request_seconds', time.perf_counter() - started, **labels)
+        self._metrics.inc('vk_requests_total', status=str(result.status_code), **labels)
+        if not kwargs.get('stream'):
+            self._metrics.inc('vk_response_bytes_total', len(result.content), **labels)
+            self._check_logged_out(requested_url, result.content)
+        return result
+
+    def _rewrite_host(self, url):
+        """
+        Send a request meant for vk.com somewhere else, e.g. to a local stand-in
+        :param url: str
+        :return: str
+
+        """
+        for origin, target in self._hosts.items():
+            if url.startswith(origin) and url[len(origin):len(origin) + 1] in ('', '/', '?'):
+                return target + url[len(origin):]
+        return url
+
+    def _save_session(self, force=False):
+        """
+        Save the cookies if they changed, see SessionStore.save
+        :param force: bool
+        :return: bool True if they were written
+
+        """
+        return self._session_store.save(self.get_session().cookies, force)
 
     def _search_friend(self):
-        time.sleep(3)
         r = self._get('https://vk.com/friends?act=find')
         city = self._cities.get_rand_city()
         status = random.choice([1, 5, 6])
@@ -801,26 +1173,12 @@ class SkynetBot:
                 params['al_ad'] = 0
                 params['offset'] = offset
 
-            time.sleep(3)
             r = self._post('https://vk.com/al_search.php', data=params)
+            page = vk_responses.parse_search_response(r.text)
 
-            try:
-                result = re.search('"has_more":true', r.text).group(0)
-                new_offset = re.search('"offset":([0-9]+)', r.text).group(1)
-                new_offset = int(new_offset)
-                has_more = True
-            except AttributeError:
-                new_offset = None
-                has_more = False
-
-            buttons = re.findall('<button id="search_sub([0-9]+)"([^>]*)this, ([0-9]+), \'([^>]*)\', true([^>]*)>Добавить в друзья</button>', r.text)
-            ids = []
-            for friend_id, trash, same_id, friend_hash, button_end in buttons:
-                if not re.match('(.*)display: none;(.*)', button_end):
-                    ids.append((friend_id, friend_hash))
-
-            if not len(ids) and has_more and new_offset and new_offset > offset:
-                ids = recursive_search_friends(new_offset)
+            ids = page.people
+            if not len(ids) and page.has_more and page.offset and page.offset > offset:
+                ids = recursive_search_friends(page.offset)
             return ids
 
         people_ids = recursive_search_friends()
@@ -842,6 +1200,7 @@ class SkynetBot:
 
     def _solve_antigate_captcha(self, captcha_key):
         self._log('Resolving captcha in Antigate')
+        from python3_anticaptcha import NoCaptchaTaskProxyless
         task = NoCaptchaTaskProxyless.NoCaptchaTaskProxyless(anticaptcha_key=self.antigate_key)
         result = task.captcha_handler(websiteURL='https://vk.com', websiteKey=captcha_key)
         if result['errorId'] == 0 and 'solution' in result:
@@ -853,7 +1212,7 @@ class SkynetBot:
     def _solve_rucaptcha_captcha(self, captcha_key):
         self._log('Resolving captcha in RuCaptcha')
         url = 'http://rucaptcha.com/in.php?key=' + self.rucaptcha_key + '&method=userrecaptcha&googlekey=' + captcha_key + '&pageurl=https://vk.com'
-        r = requests.get(url)
+        r = requests.get(url, timeout=transport.DEFAULT_TIMEOUT)
         if r.status_code != 200:
             self._log('Rucaptcha returns error ' + str(r.status_code) + ' for url: ' + url)
             return False
@@ -863,7 +1222,7 @@ class SkynetBot:
         while True:
             time.sleep(10)
             url = 'http://rucaptcha.com/res.php?key=' + self.rucaptcha_key + '&action=get&id=' + captcha_id
-            r = requests.get(url)
+            r = requests.get(url, timeout=transport.DEFAULT_TIMEOUT)
             if r.status_code != 200:
                 self._log('Rucaptcha returns error ' + str(r.status_code) + ' for url: ' + url)
                 return False
@@ -873,74 +1232,132 @@ class SkynetBot:
                     return False
                 return r.text[3:]
 
+    def _store_new_posts(self, wall, entries, parse):
+        """
+        The crawl of _crawl_wall, whatever the posts were read from
+        :param wall: str
+        :param entries: iterable of (key, pinned, post), the newest first
+        :param parse: callable turning a post into a PostRecord, or into None
+            for a post that must not be reposted
+        :return: int number of new posts
+
+        """
+        store = self._get_post_store()
+        high_water_mark = store.get_high_water_mark(wall)
+        newest_key = None
+        new_posts = []
+        for key, pinned, post in entries:
+            if not key:
+                continue
+            if not pinned:
+                if newest_key is None:
+                    newest_key = key
+                if key == high_water_mark:
+                    break
+            if store.has_post(key):
+                if pinned:
+                    continue
+                break
+            record = parse(post)
+            if record is not None:
+                new_posts.append(record)
+
+        store.add_posts(wall, new_posts)
+        if newest_key:
+            store.set_high_water_mark(wall, newest_key)
+        return len(new_posts)
+
 
-def cycle_bot(sc, bot):
+def cycle_bot(scheduler, bot, now=None):
+    """
+    Run the bot actions that are due
+    :param scheduler: ActionScheduler
+    :param bot: SkynetBot
+    :param now: float timestamp, the current time by default
+    :return: list of (action name, result)
+
+    """
     print("Cycling bot...")
-    action = False
-
-    now = datetime.datetime.now()
-    if now.hour > 3:
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_REPOST_RANDOM):
-                action = bot.repost_random_post()
-                if action:
-                    bot.update_action_timestamp(bot.ACTION_REPOST_RANDOM)
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_REPOST_OUR):
-                action = bot.repost_our_post()
-                if action:
-                    bot.update_action_timestamp(bot.ACTION_REPOST_OUR)
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_ADD_FRIEND):
-                action = bot.add_friend()
-                bot.update_action_timestamp(bot.ACTION_ADD_FRIEND)
-
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_CHECK_FRIENDS):
-                action = bot.check_friends()
-                bot.update_action_timestamp(bot.ACTION_CHECK_FRIENDS)
-
-        if not action and now.hour == 11:
-            if bot.check_action_timestamp(bot.ACTION_SEND_STAT):
-                action = bot.send_stat()
-                bot.update_action_timestamp(bot.ACTION_SEND_STAT)
-
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_VISIT_GROUP):
-                action = bot.visit_group()
-                bot.update_action_timestamp(bot.ACTION_VISIT_GROUP)
-
-        if not action:
-            if bot.check_action_timestamp(bot.ACTION_ONLINE):
-                bot.get_online()
-                bot.update_action_timestamp(bot.ACTION_ONLINE)
-
-    sc.enter(60, 1, cycle_bot, (sc, bot))
-
-
-admin_vk_id = settings.admin_vk_id
-username = settings.username
-password = settings.password
-antigate_key = settings.antigate_key
-rucaptcha_key = settings.rucaptcha_key
-vk_my_group = settings.vk_my_group
-
-logger = Logger()
-
-
-def run_bot():
-    try:
-        if len(sys.argv) < 2 or sys.argv[1] != 'debug':
-            time.sleep(random.randint(1, 301))
-        skynet_bot = SkynetBot(admin_vk_id=admin_vk_id, username=username, password=password, logger=logger,
-                               antigate_key=antigate_key, rucaptcha_key=rucaptcha_key,
-                               vk_my_group=vk_my_group)
-        scheduler = sched.scheduler(time.time, time.sleep)
-        scheduler.enter(5, 1, cycle_bot, (scheduler, skynet_bot))
-        scheduler.run()
-    except Exception as e:
-        logger.crash_log(e)
-        run_bot()
-
-
-run_bot()
+    started = time.perf_counter()
+    bot.clear_page_cache()
+    results = scheduler.run_due(bot, now)
+    bot.get_metrics().observe('vk_cycle_seconds', time.perf_counter() - started)
+    return results
+
+
+def create_bot(logger=None, metrics=None):
+    """
+    A bot configured from settings.py
+    :param logger: Logger
+    :param metrics: Metrics
+    :return: SkynetBot
+
+    """
+    import settings
+    # seconds a downloaded wall of a group or of another bot is reused, 0 to download them every time
+    http_cache_ttl = getattr(settings, 'http_cache_ttl', 0)
+    # with an API access token the walls are read through wall.get instead of their pages
+    api_token = getattr(settings, 'api_token', '')
+    return SkynetBot(admin_vk_id=settings.admin_vk_id, username=settings.username, password=settings.password,
+                     antigate_key=settings.antigate_key, rucaptcha_key=settings.rucaptcha_key,
+                     vk_my_group=settings.vk_my_group, logger=logger, metrics=metrics or Metrics(),
+                     http_cache=HttpCache(ttl=http_cache_ttl) if http_cache_ttl else None,
+                     wall_api=WallApi(api_token) if api_token else None)
+
+
+def run_cycles(bot, profiler=None):
+    """
+    Run the bot actions as they become due, until something crashes
+    :param bot: SkynetBot
+    :param profiler: CycleProfiler or None
+
+    """
+    scheduler = ActionScheduler(bot.get_action_policies())
+    cycle = profiler.wrap(cycle_bot) if profiler else cycle_bot
+    while True:
+        time.sleep(scheduler.next_delay())
+        cycle(scheduler, bot)
+        bot.get_metrics().maybe_export()
+
+
+def parse_args(argv=None):
+    """
+    :param argv: list of str, sys.argv[1:] by default
+    :return: argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(prog='vk-bot', description='vk.com bot, runs until it is stopped')
+    parser.add_argument('mode', nargs='?', choices=['debug'],
+                        help='same as --no-delay, kept for the old "bot.py debug" call')
+    parser.add_argument('--no-delay', action='store_true',
+                        help='start at once instead of after a random delay of up to 5 minutes')
+    parser.add_argument('--profile', type=int, metavar='N',
+                        help='profile every N-th cycle into tmp/profile, see profiler.py')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--quiet', action='store_true', help='write the log to tmp/ only, not to the console')
+    args = parser.parse_args(argv)
+    if args.mode == 'debug':
+        args.no_delay = True
+    return args
+
+
+def run_bot(argv=None):
+    """
+    The command line entry point
+    :param argv: list of str, sys.argv[1:] by default
+
+    """
+    args = parse_args(argv)
+    if not args.no_delay:
+        time.sleep(random.randint(1, 301))
+    logger = Logger(level=logging.getLevelName(args.log_level), console=not args.quiet)
+    metrics = Metrics()
+    profiler = CycleProfiler.from_settings(args.profile, os.environ)
+    bot_factory = functools.partial(create_bot, logger=logger, metrics=metrics)
+    supervisor = Supervisor(bot_factory, functools.partial(run_cycles, profiler=profiler), logger=logger,
+                            metrics=metrics)
+    supervisor.run()
+
+
+if __name__ == '__main__':
+    run_bot()
@@ -0,0 +1,220 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+
+class CachedPage:
+    """
+    A page body kept on disk with its validators
+
+    version changes only when a new body is stored, a revalidated page
+    keeps it, and with it the documents parsed from it.
+
+    """
+
+    __slots__ = ('url', 'path', 'content', 'encoding', 'etag', 'last_modified', 'stored_at', 'checked_at',
+                 'version')
+
+    def __init__(self, url, path, content, encoding, etag, last_modified, stored_at, checked_at, version):
+        self.url = url
+        self.path = path
+        self.content = content
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.checked_at = checked_at
+        self.version = version
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class HttpCache:
+    """
+    Disk cache of read-only pages with conditional revalidation
+
+    A page younger than `ttl` seconds (since it was last downloaded or
+    revalidated) is served without a request. An older one is asked for
+    with If-None-Match/If-Modified-Since when the server gave an ETag or
+    Last-Modified, and a 304 answer renews it without a download. Bodies
+    are stored zlib-compressed, one file per URL. The directory holds at
+    most `max_pages` files, none older than `max_age` seconds, the least
+    recently written go first.
+
+    Parsed documents of the cached bodies are kept in memory, the `documents`
+    most recently used, so a page that did not change is not parsed again.
+
+    """
+
+    def __init__(self, directory='tmp/http_cache', ttl=300, documents=32, max_pages=256,
+                 max_age=7 * 24 * 60 * 60):
+        """
+        :param directory: str
+        :param ttl: float seconds a page is used without asking the server
+        :param documents: int parsed documents kept in memory
+        :param max_pages: int pages kept on disk
+        :param max_age: float seconds a page is kept on disk since it was last written
+
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_documents = documents
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self._documents = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """
+        :param url: str
+        :return: CachedPage or None
+
+        """
+        path = self._get_path(url)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode('utf-8'))
+                content = zlib.decompress(f.read())
+        except (IOError, ValueError, zlib.error):
+            return None
+        return CachedPage(url, path, content, meta['encoding'], meta['etag'], meta['last_modified'],
+                          meta['stored_at'], meta['checked_at'], meta['version'])
+
+    def is_fresh(self, page, now=None):
+        """
+        :param page: CachedPage
+        :param now: float
+        :return: bool True if the page can be used without asking the server
+
+        """
+        now = time.time() if now is None else now
+        return now - page.checked_at < self.ttl
+
+    def get_conditional_headers(self, page):
+        """
+        Request headers that let the server answer 304 Not Modified
+        :param page: CachedPage or None
+        :return: dict
+
+        """
+        headers = {}
+        if page is not None:
+            if page.etag:
+                headers['if-none-match'] = page.etag
+            if page.last_modified:
+                headers['if-modified-since'] = page.last_modified
+        return headers
+
+    def store(self, url, response):
+        """
+        Store a downloaded page, evicting the oldest ones over the limits
+        :param url: str
+        :param response: Response with the body already read
+        :return: CachedPage
+
+        """
+        now = time.time()
+        page = CachedPage(url, self._get_path(url), response.content, response.encoding,
+                          response.headers.get('etag'), response.headers.get('last-modified'), now, now,
+                          '%f' % now)
+        self._write(page)
+        self.prune(now)
+        return page
+
+    def prune(self, now=None):
+        """
+        Delete the pages older than max_age and, over max_pages, the least
+        recently written ones
+        :param now: float
+        :return: int number of deleted files
+
+        """
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        files = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+        deleted = 0
+        for position, (mtime, path) in enumerate(files):
+            if position >= self.max_pages or now - mtime > self.max_age:
+                try:
+                    os.remove(path)
+                    deleted += 1
+                except OSError:
+                    pass
+        return deleted
+
+    def revalidated(self, page, response):
+        """
+        Renew a page the server answered 304 Not Modified for
+        :param page: CachedPage
+        :param response: Response
+        :return: CachedPage
+
+        """
+        page.checked_at = time.time()
+        page.etag = response.headers.get('etag') or page.etag
+        page.last_modified = response.headers.get('last-modified') or page.last_modified
+        self._write(page)
+        return page
+
+    def get_document(self, page, scope=None):
+        """
+        :param page: CachedPage
+        :param scope: parse scope of page_parser
+        :return: BeautifulSoup or None
+
+        """
+        key = (page.path, page.version, scope)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set_document(self, page, scope, document):
+        """
+        :param page: CachedPage
+        :param scope: parse scope of page_parser
+        :param document: BeautifulSoup
+
+        """
+        with self._lock:
+            self._documents[(page.path, page.version, scope)] = document
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def _get_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.page')
+
+    def _write(self, page):
+        meta = {
+            'url': page.url,
+            'encoding': page.encoding,
+            'etag': page.etag,
+            'last_modified': page.last_modified,
+            'stored_at': page.stored_at,
+            'checked_at': page.checked_at,
+            'version': page.version,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (page.path, threading.get_ident())
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(zlib.compress(page.content))
+        os.replace(tmp_path, page.path)
@@ -1,31 +1,137 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
 import os
-import traceback
-from time import gmtime, strftime
+import queue
+import shutil
+import sys
+import threading
+import time
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+CRITICAL = logging.CRITICAL
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
 
 
 class Logger:
+    """
+    Bot log written from a background thread
+
+    log() and crash_log() only put a record on a queue; a QueueListener
+    thread formats it and writes it to the log file (and to the console).
+    The files are rotated by size, or by time if `when` is given, and the
+    rotated ones may be gzipped. Crashes also go to their own file.
+
+    """
+
+    def __init__(self, path='tmp/bot_log.out', crash_path='tmp/crash_log.out', level=INFO, console=True,
+                 max_bytes=5 * 2 ** 20, when=None, backup_count=5, compress=True):
+        """
+        :param path: str
+        :param crash_path: str
+        :param level: int records below it are dropped before they are queued
+        :param console: bool print the records too
+        :param max_bytes: int size a log file is rotated at, 0 to never rotate by size
+        :param when: str or None rotate by time instead, as in TimedRotatingFileHandler ('midnight', 'H', ...)
+        :param backup_count: int rotated files to keep
+        :param compress: bool gzip the rotated files
+
+        """
+        self.path = path
+        self.crash_path = crash_path
+        self.level = level
+        self.console = console
+        self.max_bytes = max_bytes
+        self.when = when
+        self.backup_count = backup_count
+        self.compress = compress
+
+        self._logger = logging.Logger('vk_bot', level)
+        self._logger.propagate = False
+        self._queue = queue.SimpleQueue()
+        self._listener = None
+        self._handlers = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
 
-    def log(self, msg):
-        try:
-            os.makedirs(os.path.dirname('tmp/bot_log.out'), exist_ok=True)
-            now = strftime("%Y-%m-%d %H:%M:%S", gmtime())
-            msg = now+': '+msg.encode().decode("utf-8")+'\r\n'
-            print(msg)
-            with open('tmp/bot_log.out', 'a') as f:
-                f.write(msg)
-        except BrokenPipeError as e:
-            with open('broken_pipe_log.out', 'a') as f:
-                f.write(traceback.format_exc())
+    def log(self, msg, level=INFO):
+        """
+        :param msg: str
+        :param level: int
+
+        """
+        if level < self.level:
+            return
+        self._start()
+        self._logger.log(level, msg)
 
     def crash_log(self, e):
-        try:
-            os.makedirs(os.path.dirname('tmp/crash_log.out'), exist_ok=True)
-            now = strftime("%Y-%m-%d %H:%M:%S", gmtime())
-            traceback_str = traceback.format_exc()
-            msg = now+': '+str(e).encode().decode("utf-8")+'\r\n'+traceback_str+'\r\n'
-            print(msg)
-            with open('crash_log.out', 'a') as f:
-                f.write(msg)
-        except BrokenPipeError as e:
-            with open('broken_pipe_log.out', 'a') as f:
-                f.write(traceback.format_exc())
+        """
+        Log an exception with its traceback
+        :param e: Exception
+
+        """
+        self._start()
+        self._logger.critical(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    def close(self):
+        """
+        Write out the queued records and close the files
+
+        """
+        with self._lock:
+            if self._listener is None:
+                return
+            self._listener.stop()
+            self._listener = None
+            self._logger.handlers.clear()
+            for handler in self._handlers:
+                handler.close()
+            self._handlers = []
+
+    def _create_file_handler(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if self.when:
+            handler = logging.handlers.TimedRotatingFileHandler(path, when=self.when, backupCount=self.backup_count,
+                                                                encoding='utf-8', delay=True)
+        else:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=self.max_bytes,
+                                                           backupCount=self.backup_count, encoding='utf-8',
+                                                           delay=True)
+        if self.compress:
+            handler.rotator = _gzip_rotator
+            handler.namer = lambda name: name + '.gz'
+        handler.terminator = '\r\n'
+        return handler
+
+    def _start(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            formatter = logging.Formatter('%(asctime)s: %(message)s', '%Y-%m-%d %H:%M:%S')
+            formatter.converter = time.gmtime
+
+            handlers = [self._create_file_handler(self.path)]
+            crash_handler = self._create_file_handler(self.crash_path)
+            crash_handler.setLevel(CRITICAL)
+            handlers.append(crash_handler)
+            if self.console:
+                handlers.append(logging.StreamHandler(sys.stdout))
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+            self._handlers = handlers
+            self._logger.addHandler(logging.handlers.QueueHandler(self._queue))
+            self._listener = logging.handlers.QueueListener(self._queue, *handlers, respect_handler_level=True)
+            self._listener.start()
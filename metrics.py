@@ -0,0 +1,229 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+# seconds, from a cache hit to a slow captcha round trip
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their sum
+
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, observations up to it), the last bound is inf
+
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """
+    Counters and latency histograms of the bot, kept in memory
+
+    Every value is identified by a metric name and a set of labels. The
+    whole registry is written to a file in the Prometheus text format (or
+    as JSON if the path ends with .json) by export(), maybe_export() does
+    it at most once per export_interval seconds.
+
+    """
+
+    def __init__(self, path='tmp/vk_metrics.prom', export_interval=60):
+        """
+        :param path: str
+        :param export_interval: float seconds
+
+        """
+        self.path = path
+        self.export_interval = export_interval
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._exported_at = None
+
+    def inc(self, name, value=1, **labels):
+        """
+        :param name: str
+        :param value: float
+        :param labels: str label values
+
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Add a value to a histogram
+        :param name: str
+        :param value: float
+        :param labels: str label values
+
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def get_counter(self, name, **labels):
+        """
+        :return: float 0 if never incremented
+
+        """
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_histogram(self, name, **labels):
+        """
+        :return: Histogram or None
+
+        """
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def export(self, path=None):
+        """
+        Rewrite the metrics file atomically
+        :param path: str, self.path by default
+
+        """
+        path = path or self.path
+        if path.endswith('.json'):
+            text = json.dumps(self.to_dict(), indent=1, sort_keys=True)
+        else:
+            text = self.to_prometheus()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self._exported_at = time.monotonic()
+
+    def maybe_export(self):
+        """
+        Export if the last export is older than export_interval
+        :return: bool True if the file was written
+
+        """
+        if self._exported_at is not None and time.monotonic() - self._exported_at < self.export_interval:
+            return False
+        self.export()
+        return True
+
+    def to_dict(self):
+        """
+        :return: dict {'counters': [...], 'histograms': [...]}
+
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                           'buckets': [[_format_bound(bound), count] for bound, count in h.cumulative()]}
+                          for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0])]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self):
+        """
+        :return: str the Prometheus text exposition format
+
+        """
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append('# TYPE %s counter' % name)
+                lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append('# TYPE %s histogram' % name)
+                for bound, count in histogram.cumulative():
+                    bucket_labels = labels + (('le', _format_bound(bound)),)
+                    lines.append('%s_bucket%s %d' % (name, _format_labels(bucket_labels), count))
+                lines.append('%s_sum%s %s' % (name, _format_labels(labels), _format_value(histogram.sum)))
+                lines.append('%s_count%s %d' % (name, _format_labels(labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+def endpoint_label(url):
+    """
+    A label for the requested endpoint that does not grow with the pages
+
+    The al_*.php handlers and the API methods keep their path, walls and
+    profiles are all counted as one page endpoint of their host.
+    :param url: str
+    :return: str
+
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or '/'
+    if path != '/' and not path.endswith('.php') and not path.startswith('/method/'):
+        path = '/<page>'
+    return parts.netloc + path
+
+
+def timed_action(method):
+    """
+    Count the runs of a SkynetBot action and their results, and time them
+
+    Exceptions are counted as the 'error' result and raised again.
+
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = 'error'
+        try:
+            value = method(self, *args, **kwargs)
+            result = 'ok' if value else 'fail'
+            return value
+        finally:
+            self._metrics.observe('vk_action_seconds', time.perf_counter() - started, action=method.__name__)
+            self._metrics.inc('vk_actions_total', action=method.__name__, result=result)
+    return wrapper
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that keeps an average request rate
+
+    Unlike a fixed pause before every request it counts the time already
+    spent on the network and on parsing, so a request only waits for what
+    is left of its interval. Callers that arrive together are queued: each
+    one reserves the next free slot and sleeps until it comes.
+
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: float tokens per second
+        :param capacity: int how many requests may go out back to back
+
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting for it if needed
+        :return: float seconds waited
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
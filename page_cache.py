@@ -0,0 +1,120 @@
+import time
+
+from page_parser import release_document
+
+
+class PageCache:
+    """
+    Short-lived storage of downloaded pages together with their parsed documents
+
+    One bot cycle opens the same pages (the main page, the bot's own wall)
+    several times; the cache lets them be fetched and parsed only once.
+    A page can hold several documents, one per parse scope. Entries expire
+    after `ttl` seconds and must be invalidated after any action that
+    changes what the pages show. At most `max_pages` pages are kept, the
+    oldest stored one goes first.
+
+    """
+
+    def __init__(self, ttl=60, max_pages=16):
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._pages = {}
+
+    def get(self, url):
+        """
+        Get a fresh response
+        :param url: str
+        :return: Response or None
+
+        """
+        entry = self._get_entry(url)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def get_document(self, url, scope=None):
+        """
+        Get a parsed document of a fresh page
+
+        A document of the whole page serves any scope.
+        :param url: str
+        :param scope: parse scope of page_parser
+        :return: BeautifulSoup or None
+
+        """
+        entry = self._get_entry(url)
+        if entry is None:
+            return None
+        documents = entry[2]
+        if scope in documents:
+            return documents[scope]
+        return documents.get(None)
+
+    def set(self, url, response):
+        """
+        Store a page
+        :param url: str
+        :param response: Response, or whatever else was read from the url
+        :return: bool
+
+        """
+        self._pages.pop(url, None)
+        self._pages[url] = (time.time(), response, {})
+        while len(self._pages) > self.max_pages:
+            del self._pages[next(iter(self._pages))]
+        return True
+
+    def set_document(self, url, scope, document):
+        """
+        Attach a parsed document to a stored page
+        :param url: str
+        :param scope: parse scope of page_parser
+        :param document: BeautifulSoup
+        :return: bool
+
+        """
+        entry = self._get_entry(url)
+        if entry is None:
+            return False
+        entry[2][scope] = document
+        return True
+
+    def invalidate(self, url=None):
+        """
+        Drop one page or, without url, every page
+        :param url: str
+        :return: bool
+
+        """
+        if url is None:
+            self._pages.clear()
+        else:
+            self._pages.pop(url, None)
+        return True
+
+    def release(self):
+        """
+        Drop every page and free the trees of their documents, for when no
+        document taken from the cache is in use any more, e.g. between cycles
+        :return: bool
+
+        """
+        documents = {id(document): document for _, _, page_documents in self._pages.values()
+                     for document in page_documents.values()}
+        self._pages.clear()
+        for document in documents.values():
+            release_document(document)
+        return True
+
+    def _get_entry(self, url):
+        entry = self._pages.get(url)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self._pages[url]
+            return None
+        return entry
+
+    def __len__(self):
+        return len(self._pages)
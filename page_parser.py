@@ -0,0 +1,61 @@
+import importlib.util
+import re
+
+# bs4 and lxml are imported on the first parse, importing this module stays cheap
+PARSER_BACKEND = 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+SCOPE_COUNTERS = 'counters'
+SCOPE_WALL = 'wall'
+
+_scopes = {}
+
+
+def parse_page(markup, scope=None):
+    """
+    Build a document tree of a page
+
+    The fastest available backend is used (lxml, with html.parser as a
+    fallback). With a scope only the matching part of the page is turned
+    into a tree, everything else is skipped while parsing.
+    :param markup: str
+    :param scope: None for the whole page, SCOPE_WALL or SCOPE_COUNTERS
+    :return: BeautifulSoup
+
+    """
+    from bs4 import BeautifulSoup
+    parse_only = _get_scope(scope) if scope else None
+    return BeautifulSoup(markup, PARSER_BACKEND, parse_only=parse_only)
+
+
+def release_document(document):
+    """
+    Free a document tree right away
+
+    A tree is full of reference cycles (parents, siblings) and, left
+    alone, waits for the garbage collector. decompose() breaks them, so
+    its memory comes back as soon as the last reference is dropped. The
+    document must not be used afterwards.
+    :param document: BeautifulSoup or None
+
+    """
+    if document is not None:
+        # the root is not linked to the elements below it, its own decompose() would stop at itself
+        for element in list(document.contents):
+            element.decompose()
+        document.decompose()
+
+
+def _get_scope(scope):
+    strainer = _scopes.get(scope)
+    if strainer is None:
+        from bs4 import SoupStrainer
+        if scope == SCOPE_WALL:
+            # the posts list of a group or profile wall, '.wall_posts .post.own' keeps working
+            strainer = SoupStrainer('div', class_=re.compile(r'(^|\s)wall_posts(\s|$)'))
+        elif scope == SCOPE_COUNTERS:
+            # friends/requests/messages counters of the profile page used by send_stat
+            strainer = SoupStrainer(id=['profile_friends', 'l_fr', 'l_msg'])
+        else:
+            raise KeyError(scope)
+        _scopes[scope] = strainer
+    return strainer
@@ -0,0 +1,92 @@
+import codecs
+
+POST_START_MARKER = '<div id="post'
+
+# what follows the posts list of a group or profile wall
+WALL_END_MARKERS = ('id="wall_more_link"', 'id="footer_wrap"')
+
+
+def read_page(response, max_posts=None, stop_markers=WALL_END_MARKERS, chunk_size=16 * 1024):
+    """
+    Read a streamed response only as far as the caller needs
+
+    Chunks are decoded incrementally and scanned for the start of posts and
+    for the stop markers. Reading ends and the connection is closed as soon
+    as max_posts posts are complete (the next post has started) or a stop
+    marker shows up; the page is cut right before that point. HTML parsers
+    close the elements left open by the cut. A stop marker where the first
+    post starts is passed over: walls pin a post on top whatever its age,
+    so the first post does not tell where the known posts begin.
+
+    The body read so far becomes the response content, so response.text
+    works as usual afterwards.
+    :param response: Response requested with stream=True
+    :param max_posts: int or None to keep every post
+    :param stop_markers: iterable of str
+    :param chunk_size: int
+    :return: int number of bytes received
+
+    """
+    encoding = response.encoding or 'utf-8'
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    stop_markers = tuple(stop_markers)
+    longest_stop_marker = max([len(marker) for marker in stop_markers] or [0])
+
+    text = ''
+    first_post = None
+    posts_seen = 0
+    next_post_search = 0
+    received = 0
+    cut = None
+    try:
+        for chunk in response.iter_content(chunk_size):
+            received += len(chunk)
+            scanned = len(text)
+            text += decoder.decode(chunk)
+
+            # markers may straddle two chunks, so the tail of the previous one is scanned again
+            stop_search = max(0, scanned - longest_stop_marker + 1)
+            if first_post is None:
+                first_post = text.find(POST_START_MARKER)
+                if first_post == -1:
+                    first_post = None
+            for marker in stop_markers:
+                position = text.find(marker, stop_search)
+                if position != -1 and position == first_post:
+                    position = text.find(marker, position + 1)
+                if position != -1 and (cut is None or position < cut):
+                    cut = position
+
+            if max_posts is not None:
+                position = text.find(POST_START_MARKER, next_post_search)
+                while position != -1 and (cut is None or position < cut):
+                    posts_seen += 1
+                    if posts_seen > max_posts:
+                        cut = position
+                        break
+                    next_post_search = position + 1
+                    position = text.find(POST_START_MARKER, next_post_search)
+                next_post_search = max(next_post_search, len(text) - len(POST_START_MARKER) + 1)
+
+            if cut is not None:
+                text = text[:cut]
+                break
+        else:
+            text += decoder.decode(b'', True)
+    finally:
+        response.close()
+
+    response._content = text.encode(encoding, errors='replace')
+    response._content_consumed = True
+    response.encoding = encoding
+    return received
+
+
+def post_marker(key):
+    """
+    The markup a post starts with, to stop reading a wall at a known post
+    :param key: (owner_id, post_id)
+    :return: str
+
+    """
+    return '%s%d_%d"' % (POST_START_MARKER, key[0], key[1])
@@ -0,0 +1,156 @@
+import calendar
+import datetime
+import re
+import time
+
+from months import months
+
+# relative dates, "5 минут назад", "час назад", "два часа назад"
+_RELATIVE_RE = re.compile(r'^(?:(\S+)\s+)?(\S+)\s+назад$')
+# "сегодня в 13:45", "вчера в 9:05"
+_DAY_RE = re.compile(r'^(сегодня|вчера)\s+в\s+(\d{1,2}):(\d{2})$')
+# "7 ноября в 7:07", "15 января 2017 в 14:20", "11 марта 2016"
+_DATE_RE = re.compile(r'^(\d{1,2})\s+(\S+?)(?:\s+(\d{4}))?(?:\s+в\s+(\d{1,2}):(\d{2}))?$')
+# "17", "48K", "2.1M"
+_COUNT_RE = re.compile(r'^(\d+(?:[.,]\d+)?)\s*([KMB]?)$')
+
+_NUMBER_WORDS = {
+    'один': 1, 'одну': 1, 'одна': 1, 'два': 2, 'две': 2, 'три': 3, 'четыре': 4, 'пять': 5,
+    'шесть': 6, 'семь': 7, 'восемь': 8, 'девять': 9, 'десять': 10,
+}
+# stems of the unit words in all their forms, "минуту", "минуты", "минут"
+_UNITS = (
+    ('секунд', 1),
+    ('минут', 60),
+    ('час', 60 * 60),
+    ('день', 24 * 60 * 60),
+    ('дн', 24 * 60 * 60),
+    ('недел', 7 * 24 * 60 * 60),
+    ('месяц', 30 * 24 * 60 * 60),
+    ('год', 365 * 24 * 60 * 60),
+    ('лет', 365 * 24 * 60 * 60),
+)
+_MULTIPLIERS = {'': 1, 'K': 1000, 'M': 1000000, 'B': 1000000000}
+
+
+class PostMetaNormalizer:
+    """
+    Turns the dates and counters of wall posts into numbers
+
+    Relative dates are resolved against one reference clock taken when the
+    normalizer is created, so every post of a batch is measured from the
+    same moment; is_current() tells when it is time for a new one. Every
+    distinct string is parsed once, repeated ones come from a dict of at
+    most `cache_size` entries. Strings of an unknown form give 0, nothing
+    is raised.
+
+    """
+
+    def __init__(self, now=None, max_age=60, cache_size=4096):
+        """
+        :param now: float reference timestamp, the current time by default
+        :param max_age: float seconds the reference clock is good for
+        :param cache_size: int parsed strings remembered of each kind
+
+        """
+        self.now = time.time() if now is None else now
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self._today = datetime.datetime.fromtimestamp(self.now).date()
+        self._yesterday = self._today - datetime.timedelta(days=1)
+        self._dates = {}
+        self._counts = {}
+
+    def is_current(self, now=None):
+        """
+        :param now: float
+        :return: bool False if the reference clock is too old for relative dates
+
+        """
+        now = time.time() if now is None else now
+        return 0 <= now - self.now < self.max_age
+
+    def parse_count(self, text):
+        """
+        :param text: str a counter as vk.com shows it, "845", "7.5K", "2.1M"
+        :return: int 0 for an empty or unknown counter
+
+        """
+        result = self._counts.get(text)
+        if result is None:
+            if len(self._counts) >= self.cache_size:
+                self._counts.clear()
+            result = self._counts[text] = self._parse_count(text)
+        return result
+
+    def parse_date(self, text):
+        """
+        :param text: str a post date as vk.com shows it
+        :return: float timestamp, 0 for an unknown date
+
+        """
+        result = self._dates.get(text)
+        if result is None:
+            if len(self._dates) >= self.cache_size:
+                self._dates.clear()
+            result = self._dates[text] = self._parse_date(text)
+        return result
+
+    def _parse_count(self, text):
+        text = text.strip()
+        if text.isdigit():
+            return int(text)
+        match = _COUNT_RE.match(text)
+        if match is None:
+            return 0
+        return int(round(float(match.group(1).replace(',', '.')) * _MULTIPLIERS[match.group(2)]))
+
+    def _parse_date(self, text):
+        text = ' '.join(text.split()).lower()
+        if text == 'только что':
+            return self.now
+
+        match = _DAY_RE.match(text)
+        if match is not None:
+            day = self._today if match.group(1) == 'сегодня' else self._yesterday
+            return self._timestamp(day.year, day.month, day.day, int(match.group(2)), int(match.group(3)))
+
+        match = _RELATIVE_RE.match(text)
+        if match is not None:
+            return self._parse_relative(match.group(1), match.group(2))
+
+        match = _DATE_RE.match(text)
+        if match is not None:
+            day, month_name, year, hour, minute = match.groups()
+            month = months.get(month_name)
+            if month is None:
+                return 0
+            hour, minute = (int(hour), int(minute)) if hour else (0, 0)
+            if year:
+                return self._timestamp(int(year), month, int(day), hour, minute)
+            result = self._timestamp(self._today.year, month, int(day), hour, minute)
+            if result > self.now + 24 * 60 * 60:
+                # without a year it is the last date of the kind, "31 декабря" read on the 1st of January
+                result = self._timestamp(self._today.year - 1, month, int(day), hour, minute)
+            return result
+        return 0
+
+    def _parse_relative(self, number, unit):
+        if number is None:
+            count = 1
+        elif number.isdigit():
+            count = int(number)
+        else:
+            count = _NUMBER_WORDS.get(number)
+            if count is None:
+                return 0
+        for stem, seconds in _UNITS:
+            if unit.startswith(stem):
+                return self.now - count * seconds
+        return 0
+
+    def _timestamp(self, year, month, day, hour, minute):
+        # 29 февраля of a year without it, 31 of a short month
+        if not (1 <= day <= calendar.monthrange(year, month)[1] and hour < 24 and minute < 60):
+            return 0
+        return datetime.datetime(year, month, day, hour, minute).timestamp()
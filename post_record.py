@@ -0,0 +1,87 @@
+class PostRecord:
+    """
+    A parsed wall post
+
+    Posts are identified by integer (owner_id, post_id) keys taken once from
+    the markup, e.g. 'post-30666517_451230' becomes (-30666517, 451230).
+    original_key is the key of the reposted post for reposts, pinned tells
+    a post fixed on top of its wall.
+
+    """
+
+    __slots__ = (
+        'owner_id', 'post_id', 'original_key', 'view_hash',
+        'author_name', 'author_link', 'copy_author_name', 'copy_author_link',
+        'date', 'likes', 'reposts', 'views', 'rating', 'pinned',
+    )
+
+    def __init__(self, owner_id=None, post_id=None, original_key=None, view_hash=None,
+                 author_name=None, author_link=None, copy_author_name=None, copy_author_link=None,
+                 date=0, likes=0, reposts=0, views=0, rating=0, pinned=False):
+        self.owner_id = owner_id
+        self.post_id = post_id
+        self.original_key = original_key
+        self.view_hash = view_hash
+        self.author_name = author_name
+        self.author_link = author_link
+        self.copy_author_name = copy_author_name
+        self.copy_author_link = copy_author_link
+        self.date = date
+        self.likes = likes
+        self.reposts = reposts
+        self.views = views
+        self.rating = rating
+        self.pinned = pinned
+
+    @property
+    def key(self):
+        """
+        :return: (owner_id, post_id) or None if the post has no id
+
+        """
+        if self.owner_id is None or self.post_id is None:
+            return None
+        return self.owner_id, self.post_id
+
+    @property
+    def wall_object(self):
+        """
+        The object name like.php expects, e.g. 'wall-30666517_451230'
+        :return: str
+
+        """
+        return 'wall%d_%d' % (self.owner_id, self.post_id)
+
+    def __repr__(self):
+        return '<PostRecord %s rating=%s>' % (self.key, self.rating)
+
+
+def parse_post_key(post_id):
+    """
+    Turn 'post-30666517_451230', 'wall-30666517_451230' or '-30666517_451230'
+    into (-30666517, 451230)
+    :param post_id: str
+    :return: (int, int) or None
+
+    """
+    if not post_id:
+        return None
+    if post_id.startswith('post') or post_id.startswith('wall'):
+        post_id = post_id[4:]
+    owner_id, separator, item_id = post_id.partition('_')
+    if not separator:
+        return None
+    try:
+        return int(owner_id), int(item_id)
+    except ValueError:
+        return None
+
+
+def build_reposted_index(posts):
+    """
+    Keys of the posts the given posts are reposts of
+    :param posts: iterable of PostRecord
+    :return: set of (owner_id, post_id)
+
+    """
+    return {post.original_key for post in posts if post.original_key is not None}
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import time
+
+from post_record import PostRecord
+
+# what every row of get_candidate_rows holds, in this order
+CANDIDATE_COLUMNS = ('owner_id', 'post_id', 'date', 'likes', 'reposts', 'views', 'rating')
+
+
+def record_from_row(row):
+    """
+    :param row: tuple of CANDIDATE_COLUMNS
+    :return: PostRecord
+
+    """
+    return PostRecord(**dict(zip(CANDIDATE_COLUMNS, row)))
+
+
+class PostStore:
+    """
+    SQLite storage of the posts crawled from the groups walls
+
+    Every post is kept once with its rating inputs and the time it was first
+    seen. For every wall the newest crawled post is remembered as a high-water
+    mark, so the next crawl only has to parse the posts above it.
+
+    """
+
+    def __init__(self, path='tmp/vk_posts.sqlite'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS posts (
+                owner_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                wall TEXT NOT NULL,
+                date REAL NOT NULL,
+                likes REAL NOT NULL,
+                reposts REAL NOT NULL,
+                views REAL NOT NULL,
+                rating REAL NOT NULL,
+                first_seen REAL NOT NULL,
+                reposted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (owner_id, post_id)
+            );
+            CREATE INDEX IF NOT EXISTS posts_first_seen ON posts (first_seen);
+            CREATE TABLE IF NOT EXISTS walls (
+                wall TEXT PRIMARY KEY,
+                owner_id INTEGER NOT NULL,
+                post_id INTEGER NOT NULL,
+                crawled_at REAL NOT NULL
+            );
+        ''')
+        self._db.commit()
+
+    def add_posts(self, wall, posts):
+        """
+        Store posts that are not known yet
+        :param wall: str url of the wall the posts come from
+        :param posts: list of PostRecord
+        :return: int number of new posts
+
+        """
+        now = time.time()
+        rows = [
+            (post.owner_id, post.post_id, wall, post.date or 0, post.likes, post.reposts, post.views,
+             post.rating, now)
+            for post in posts if post.key
+        ]
+        before = self._db.total_changes
+        self._db.executemany(
+            'INSERT OR IGNORE INTO posts (owner_id, post_id, wall, date, likes, reposts, views, rating, first_seen) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self._db.commit()
+        return self._db.total_changes - before
+
+    def get_candidates(self, seen_since):
+        """
+        Posts that were not reposted yet, in no particular order
+        :param seen_since: float timestamp, older posts are skipped
+        :return: list of PostRecord
+
+        """
+        return [record_from_row(row) for row in self.get_candidate_rows(seen_since)]
+
+    def get_candidate_rows(self, seen_since):
+        """
+        The same posts as get_candidates as plain rows, for scoring many of
+        them without building a record for each
+        :param seen_since: float timestamp, older posts are skipped
+        :return: list of tuples of CANDIDATE_COLUMNS
+
+        """
+        return self._db.execute(
+            'SELECT %s FROM posts WHERE reposted = 0 AND first_seen >= ?' % ', '.join(CANDIDATE_COLUMNS),
+            (seen_since,)).fetchall()
+
+    def get_high_water_mark(self, wall):
+        """
+        The newest post seen on a wall during the previous crawls
+        :param wall: str
+        :return: (owner_id, post_id) or None
+
+        """
+        row = self._db.execute('SELECT owner_id, post_id FROM walls WHERE wall = ?', (wall,)).fetchone()
+        if row is None:
+            return None
+        return tuple(row)
+
+    def has_post(self, key):
+        """
+        :param key: (owner_id, post_id)
+        :return: bool
+
+        """
+        row = self._db.execute('SELECT 1 FROM posts WHERE owner_id = ? AND post_id = ?', key).fetchone()
+        return row is not None
+
+    def mark_reposted(self, key):
+        """
+        Exclude a post from the candidates
+        :param key: (owner_id, post_id)
+        :return: bool
+
+        """
+        self._db.execute('UPDATE posts SET reposted = 1 WHERE owner_id = ? AND post_id = ?', key)
+        self._db.commit()
+        return True
+
+    def prune(self, seen_before):
+        """
+        Forget posts first seen before the given time
+        :param seen_before: float timestamp
+        :return: int number of removed posts
+
+        """
+        cursor = self._db.execute('DELETE FROM posts WHERE first_seen < ?', (seen_before,))
+        self._db.commit()
+        return cursor.rowcount
+
+    def set_high_water_mark(self, wall, key):
+        """
+        :param wall: str
+        :param key: (owner_id, post_id)
+        :return: bool
+
+        """
+        self._db.execute(
+            'INSERT OR REPLACE INTO walls (wall, owner_id, post_id, crawled_at) VALUES (?, ?, ?, ?)',
+            (wall, key[0], key[1], time.time()))
+        self._db.commit()
+        return True
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,128 @@
+import cProfile
+import glob
+import os
+import time
+import tracemalloc
+
+ENV_EVERY = 'VK_BOT_PROFILE'
+ENV_DIRECTORY = 'VK_BOT_PROFILE_DIR'
+
+
+class CycleProfiler:
+    """
+    Profiles every n-th bot cycle with cProfile and tracemalloc
+
+    A profiled cycle leaves two files in the directory: cycle_<start>_<n>.prof,
+    the cProfile stats (open with pstats or snakeviz), and
+    cycle_<start>_<n>.mem.txt, the allocations that grew since the previous
+    profiled cycle; <start> tells the process apart, its cycles count from 1.
+    Only the `keep` most recently written of each are kept, whatever process
+    wrote them. tracemalloc keeps tracing between the
+    profiled cycles, so the memory diff covers everything in between.
+
+    The profiler is opt-in: without it cycles run unwrapped and cost
+    nothing extra, see from_settings().
+
+    """
+
+    def __init__(self, every=1, directory='tmp/profile', keep=10, frames=5, top=30):
+        """
+        :param every: int profile one cycle out of this many
+        :param directory: str
+        :param keep: int profiles to keep
+        :param frames: int traceback frames tracemalloc keeps per allocation
+        :param top: int lines in the memory diff
+
+        """
+        self.every = every
+        self.directory = directory
+        self.keep = keep
+        self.frames = frames
+        self.top = top
+        self.cycles = 0
+        self._start = '%s-%d' % (time.strftime('%Y%m%d-%H%M%S'), os.getpid())
+        self._snapshot = None
+
+    @classmethod
+    def from_settings(cls, every, environ):
+        """
+        Build a profiler if profiling was asked for, by `--profile N` on the
+        command line or by the VK_BOT_PROFILE=N environment variable
+        :param every: int the --profile option, None when it was not given
+        :param environ: dict
+        :return: CycleProfiler or None when profiling is off
+
+        """
+        if every is None:
+            every = environ.get(ENV_EVERY) or 0
+        try:
+            every = int(every)
+        except ValueError:
+            every = 1
+        if every <= 0:
+            return None
+        return cls(every, environ.get(ENV_DIRECTORY) or 'tmp/profile')
+
+    def wrap(self, cycle):
+        """
+        :param cycle: callable running one bot cycle
+        :return: callable with the same arguments
+
+        """
+        def profiled_cycle(*args, **kwargs):
+            return self.run(cycle, *args, **kwargs)
+        return profiled_cycle
+
+    def run(self, cycle, *args, **kwargs):
+        """
+        Run a cycle, profiling it if it is its turn
+        :param cycle: callable
+        :return: what the cycle returns
+
+        """
+        self.cycles += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        if self.cycles % self.every:
+            return cycle(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profile.runcall(cycle, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._write(profile, elapsed)
+
+    def _prune(self, pattern):
+        # by age, the cycle numbers of a process that restarted begin at 1 again
+        paths = sorted(glob.glob(os.path.join(self.directory, pattern)),
+                       key=lambda path: (os.path.getmtime(path), path))
+        for path in paths[:-self.keep]:
+            os.remove(path)
+
+    def _write(self, profile, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        name = os.path.join(self.directory, 'cycle_%s_%08d' % (self._start, self.cycles))
+        profile.dump_stats(name + '.prof')
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ['cycle %d, %.3f s, traced memory %.1f KiB, peak %.1f KiB' % (
+            self.cycles, elapsed, current / 1024, peak / 1024)]
+        if self._snapshot is None:
+            lines.append('largest allocations:')
+            lines += [str(stat) for stat in snapshot.statistics('lineno')[:self.top]]
+        else:
+            lines.append('growth since the previous profiled cycle:')
+            lines += [str(stat) for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top]]
+        with open(name + '.mem.txt', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        self._snapshot = snapshot
+        tracemalloc.reset_peak()
+
+        self._prune('cycle_*.prof')
+        self._prune('cycle_*.mem.txt')
@@ -0,0 +1,173 @@
+import datetime
+import heapq
+import json
+import os
+import time
+
+ALL_DAY = frozenset(range(24))
+
+
+class ActionPolicy:
+    """
+    When and how often a bot action runs
+
+    name       the action name, one of SkynetBot.ACTION_* constants
+    method     the SkynetBot method that performs the action
+    period     seconds between two runs
+    priority   lower runs first when several actions are due together
+    hours      hours of the day (local time) the action may run at
+    retry_after seconds till the next try when the action returned False,
+               None to wait the whole period whatever the result
+    exclusive  a successful run ends the cycle, other due actions wait
+               for the next one
+
+    """
+
+    __slots__ = ('name', 'method', 'period', 'priority', 'hours', 'retry_after', 'exclusive')
+
+    def __init__(self, name, method, period, priority, hours=ALL_DAY, retry_after=None, exclusive=True):
+        self.name = name
+        self.method = method
+        self.period = period
+        self.priority = priority
+        self.hours = frozenset(hours)
+        self.retry_after = retry_after
+        self.exclusive = exclusive
+
+    def next_allowed_time(self, timestamp):
+        """
+        The earliest moment from timestamp on that falls into the allowed hours
+        :param timestamp: float
+        :return: float
+
+        """
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        for _ in range(24):
+            if moment.hour in self.hours:
+                return max(timestamp, moment.timestamp())
+            moment = moment.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+        return timestamp
+
+
+class ActionScheduler:
+    """
+    Runs bot actions from a priority queue keyed by their next due time
+
+    The next due times are saved after every change, so a restarted bot
+    goes on with the old schedule instead of running every action at once.
+
+    """
+
+    def __init__(self, policies, path='tmp/vk_schedule.out', cycle_gap=60):
+        """
+        :param policies: list of ActionPolicy
+        :param path: str file the due times are kept in
+        :param cycle_gap: int seconds between a successful exclusive action
+            and the next action
+
+        """
+        self.path = path
+        self.cycle_gap = cycle_gap
+        self._policies = {policy.name: policy for policy in policies}
+        self._due = self._load()
+        now = time.time()
+        for policy in policies:
+            due = self._due.get(policy.name, now)
+            self._due[policy.name] = policy.next_allowed_time(due)
+        self._heap = [(due, self._policies[name].priority, name) for name, due in self._due.items()
+                      if name in self._policies]
+        heapq.heapify(self._heap)
+
+    def get_due_time(self, name):
+        """
+        :param name: str action name
+        :return: float timestamp
+
+        """
+        return self._due[name]
+
+    def next_delay(self, now=None):
+        """
+        Seconds to sleep until the next action is due
+        :param now: float
+        :return: float
+
+        """
+        if not self._heap:
+            return self.cycle_gap
+        now = time.time() if now is None else now
+        return max(0.0, self._heap[0][0] - now)
+
+    def run_due(self, bot, now=None):
+        """
+        Run the due actions, the most important first
+
+        An exclusive action that succeeded ends the run, the actions still
+        due are moved to cycle_gap seconds after it finished. An action that
+        raised is rescheduled as one that failed and ends the run the same
+        way; the schedule is saved before the exception goes on.
+        :param bot: SkynetBot
+        :param now: float
+        :return: list of (action name, result)
+
+        """
+        now = time.time() if now is None else now
+        started = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        due.sort(key=lambda entry: entry[1])
+
+        results = []
+        done = False
+        finished = now
+        changed = bool(due)
+        try:
+            while due:
+                policy = self._policies[due.pop(0)[2]]
+                if done:
+                    self._reschedule(policy, finished + self.cycle_gap)
+                    continue
+                if datetime.datetime.fromtimestamp(now).hour not in policy.hours:
+                    self._reschedule(policy, now)
+                    continue
+
+                result = False
+                try:
+                    result = getattr(bot, policy.method)()
+                    results.append((policy.name, result))
+                finally:
+                    # now stands for the start of the run, the time the actions took is added to it
+                    finished = now + time.time() - started
+                    if result or policy.retry_after is None:
+                        self._reschedule(policy, finished + policy.period)
+                    else:
+                        self._reschedule(policy, finished + policy.retry_after)
+                if result and policy.exclusive:
+                    done = True
+        finally:
+            # left by an action that raised
+            for _, _, name in due:
+                self._reschedule(self._policies[name], finished + self.cycle_gap)
+            if changed:
+                self._save()
+        return results
+
+    def _reschedule(self, policy, timestamp):
+        due = policy.next_allowed_time(timestamp)
+        self._due[policy.name] = due
+        heapq.heappush(self._heap, (due, policy.priority, policy.name))
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return {name: float(due) for name, due in json.load(f).items()}
+        except (IOError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._due, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,116 @@
+import heapq
+import math
+import time
+
+from post_store import CANDIDATE_COLUMNS
+
+_OWNER_ID, _POST_ID, _DATE, _LIKES, _REPOSTS, _VIEWS = (
+    CANDIDATE_COLUMNS.index(name) for name in ('owner_id', 'post_id', 'date', 'likes', 'reposts', 'views'))
+# NumPy is imported on the first scoring, None when it is not installed
+_NOT_LOADED = object()
+numpy = _NOT_LOADED
+
+
+def get_numpy():
+    """
+    :return: the numpy module or None without it
+
+    """
+    global numpy
+    if numpy is _NOT_LOADED:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+
+class PostScorer:
+    """
+    Rates candidate posts and picks the best of them
+
+        score = (likes_weight * likes + reposts_weight * reposts) / views * 100
+                * 0.5 ** (age / half_life)
+
+    Posts nobody has seen yet (views below min_views) score 0, posts with
+    an unknown date (0) are not decayed. The candidates are the plain rows
+    of PostStore.get_candidate_rows, no record is built to score them. With
+    NumPy the rows are scored as one array and the top k are taken with
+    argpartition, without sorting the whole pool; without it heapq does
+    the same in pure Python.
+
+    """
+
+    def __init__(self, likes_weight=1.0, reposts_weight=1.0, half_life=24 * 60 * 60, min_views=1):
+        """
+        :param likes_weight: float
+        :param reposts_weight: float
+        :param half_life: float seconds in which a post loses half of its score, None for no decay
+        :param min_views: int
+
+        """
+        self.likes_weight = likes_weight
+        self.reposts_weight = reposts_weight
+        self.half_life = half_life
+        self.min_views = min_views
+
+    def score(self, rows, now=None):
+        """
+        :param rows: list of tuples of CANDIDATE_COLUMNS
+        :param now: float timestamp the age of the posts is counted from
+        :return: numpy array or, without NumPy, list of float
+
+        """
+        now = time.time() if now is None else now
+        numpy = get_numpy()
+        if numpy is None:
+            return [self._score_row(row, now) for row in rows]
+
+        columns = numpy.array(rows, numpy.float64).reshape(len(rows), len(CANDIDATE_COLUMNS))
+        likes, reposts, views, dates = columns[:, _LIKES], columns[:, _REPOSTS], columns[:, _VIEWS], columns[:, _DATE]
+        engagement = self.likes_weight * likes + self.reposts_weight * reposts
+        seen = (views >= self.min_views) & (views > 0)
+        scores = numpy.zeros(len(rows))
+        numpy.divide(engagement * 100, views, out=scores, where=seen)
+        if self.half_life:
+            ages = numpy.where(dates > 0, numpy.maximum(now - dates, 0), 0)
+            scores *= numpy.exp2(-ages / self.half_life)
+        return scores
+
+    def top(self, rows, k, now=None, exclude=()):
+        """
+        The k best scored rows, the best first
+        :param rows: list of tuples of CANDIDATE_COLUMNS
+        :param k: int
+        :param now: float
+        :param exclude: set of (owner_id, post_id) keys left out
+        :return: list of tuples of CANDIDATE_COLUMNS
+
+        """
+        if not rows or k <= 0:
+            return []
+        now = time.time() if now is None else now
+        # the excluded posts may all be among the best, take enough to still have k
+        wanted = min(k + len(exclude), len(rows))
+        numpy = get_numpy()
+        if numpy is None:
+            best = heapq.nlargest(wanted, rows, key=lambda row: self._score_row(row, now))
+        else:
+            scores = self.score(rows, now)
+            if wanted < len(rows):
+                indexes = numpy.argpartition(-scores, wanted - 1)[:wanted]
+            else:
+                indexes = numpy.arange(len(rows))
+            indexes = indexes[numpy.argsort(-scores[indexes], kind='stable')]
+            best = [rows[i] for i in indexes]
+        return [row for row in best if (row[_OWNER_ID], row[_POST_ID]) not in exclude][:k]
+
+    def _score_row(self, row, now):
+        views = row[_VIEWS]
+        if views < self.min_views or not views:
+            return 0.0
+        score = (self.likes_weight * row[_LIKES] + self.reposts_weight * row[_REPOSTS]) / views * 100
+        if self.half_life and row[_DATE] > 0:
+            score *= math.pow(2, -max(now - row[_DATE], 0) / self.half_life)
+        return score
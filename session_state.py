@@ -0,0 +1,56 @@
+import time
+
+
+class SessionState:
+    """
+    What is known about the login of the bot's session
+
+    Opening the main page tells whether the session is logged in and
+    whose it is; once it did, the answer is trusted for `ttl` seconds
+    and the actions skip the main page. A response that shows the login
+    form ends the trust at once, so a logout costs no extra request to
+    notice.
+
+    """
+
+    def __init__(self, ttl=30 * 60):
+        """
+        :param ttl: float seconds a verified login is trusted without opening the main page
+
+        """
+        self.ttl = ttl
+        self.vk_id = None
+        self.verified_at = None
+
+    def is_verified(self, now=None):
+        """
+        :param now: float
+        :return: bool True if the session was seen logged in less than ttl seconds ago
+
+        """
+        if self.verified_at is None:
+            return False
+        now = time.time() if now is None else now
+        return 0 <= now - self.verified_at < self.ttl
+
+    def verify(self, vk_id, now=None):
+        """
+        Remember the session was seen logged in
+        :param vk_id: str id of the logged in user
+        :param now: float
+        :return: bool
+
+        """
+        self.vk_id = vk_id
+        self.verified_at = time.time() if now is None else now
+        return True
+
+    def invalidate(self):
+        """
+        Forget the login, the next action opens the main page again
+        :return: bool True if the login was trusted until now
+
+        """
+        verified = self.verified_at is not None
+        self.verified_at = None
+        return verified
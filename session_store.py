@@ -0,0 +1,121 @@
+import json
+import os
+import pickle
+import time
+from http.cookiejar import Cookie
+
+from requests.cookies import create_cookie
+
+# Cookie attributes in the order they are stored in, one list per cookie
+_COOKIE_FIELDS = ('version', 'name', 'value', 'port', 'port_specified', 'domain', 'domain_specified',
+                  'domain_initial_dot', 'path', 'path_specified', 'secure', 'expires', 'discard', 'comment',
+                  'comment_url', 'rfc2109')
+
+
+def cookie_to_list(cookie):
+    """
+    :param cookie: http.cookiejar.Cookie
+    :return: list of its attributes, the non-standard ones last
+
+    """
+    return [getattr(cookie, field) for field in _COOKIE_FIELDS] + [cookie._rest]
+
+
+def cookie_from_list(values):
+    """
+    :param values: list made by cookie_to_list
+    :return: http.cookiejar.Cookie
+
+    """
+    fields = dict(zip(_COOKIE_FIELDS, values))
+    return Cookie(rest=values[len(_COOKIE_FIELDS)], **fields)
+
+
+class SessionStore:
+    """
+    Keeps the session cookies on disk between runs
+
+    The whole jar is saved with domains, paths and expiry dates, as one
+    JSON list per cookie. save() only writes when the cookies changed, and
+    not more often than once per min_interval seconds unless forced; the
+    file is replaced atomically so a crash never leaves half of it. The
+    old pickled name: value dict is still read.
+
+    """
+
+    def __init__(self, path='tmp/vk_cookies.out', min_interval=60):
+        """
+        :param path: str
+        :param min_interval: float seconds between two writes that are not forced
+
+        """
+        self.path = path
+        self.min_interval = min_interval
+        self.writes = 0
+        self._saved_state = frozenset()
+        self._saved_at = None
+
+    def load(self, jar):
+        """
+        Put the saved cookies into a jar
+        :param jar: CookieJar
+        :return: bool False if there was nothing to load
+
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return False
+
+        try:
+            cookies = [cookie_from_list(values) for values in json.loads(data.decode('utf-8'))]
+        except (ValueError, TypeError, IndexError):
+            cookies = self._load_legacy(data)
+            if cookies is None:
+                return False
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+        self._saved_state = self._get_state(jar)
+        return True
+
+    def save(self, jar, force=False):
+        """
+        Write the jar out if it changed since the last write
+        :param jar: CookieJar
+        :param force: bool write a changed jar even if the last write was recent
+        :return: bool True if the file was written
+
+        """
+        state = self._get_state(jar)
+        if state == self._saved_state:
+            return False
+        now = time.monotonic()
+        if not force and self._saved_at is not None and now - self._saved_at < self.min_interval:
+            return False
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump([cookie_to_list(cookie) for cookie in jar], f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved_state = state
+        self._saved_at = now
+        self.writes += 1
+        return True
+
+    def _get_state(self, jar):
+        return frozenset(tuple(cookie_to_list(cookie)[:-1]) + (tuple(sorted(cookie._rest.items())),)
+                         for cookie in jar)
+
+    def _load_legacy(self, data):
+        try:
+            cookies = pickle.loads(data)
+        except Exception:
+            return None
+        if not isinstance(cookies, dict):
+            return None
+        # the old format kept names and values only, they are loaded the way cookiejar_from_dict did
+        return [create_cookie(name, value) for name, value in cookies.items()]
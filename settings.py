@@ -4,3 +4,5 @@ username = 'vk_username'
 password = 'vk_password'
 rucaptcha_key = 'abcdef12345abcdef12345'
 vk_my_group = 'https://vk.com/buzovaofficial'
+http_cache_ttl = 0
+api_token = ''
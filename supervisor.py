@@ -0,0 +1,109 @@
+import random
+import time
+
+from logger import WARNING
+
+
+class Supervisor:
+    """
+    Keeps the bot running and restarts it after a crash
+
+    Every start gets a fresh bot (and with it a fresh HTTP session), the
+    crashed one is closed and dropped before waiting. The wait grows
+    exponentially with the crashes in a row and is reset once a run lasts
+    longer than `stable_after` seconds. Everything happens in one loop, so
+    neither the stack nor the memory grows with the number of restarts.
+    The starts and crashes are counted in the metrics and every restart
+    is logged with the crash counters.
+
+    """
+
+    def __init__(self, bot_factory, run, logger=None, metrics=None, base_delay=5, max_delay=60 * 30,
+                 stable_after=60 * 60):
+        """
+        :param bot_factory: callable returning a new SkynetBot
+        :param run: callable running the bot until it crashes, gets the bot
+        :param logger: Logger
+        :param metrics: Metrics
+        :param base_delay: float seconds to wait after the first crash
+        :param max_delay: float the longest wait
+        :param stable_after: float seconds of running that reset the backoff
+
+        """
+        self.bot_factory = bot_factory
+        self.run_bot = run
+        self.logger = logger
+        self.metrics = metrics
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+
+        self.starts = 0
+        self.crashes = 0
+        self.consecutive_crashes = 0
+        self.last_crash_at = None
+        self.last_error = None
+
+    def get_stat(self):
+        """
+        The crash counters
+        :return: dict
+
+        """
+        return {
+            'starts': self.starts,
+            'crashes': self.crashes,
+            'consecutive_crashes': self.consecutive_crashes,
+            'last_crash_at': self.last_crash_at,
+            'last_error': self.last_error,
+        }
+
+    def get_delay(self):
+        """
+        How long to wait before the next start
+        :return: float seconds
+
+        """
+        if not self.consecutive_crashes:
+            return 0
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.consecutive_crashes - 1))
+        return delay + random.uniform(0, delay / 10)
+
+    def run(self, max_starts=None):
+        """
+        Start the bot and restart it after every crash
+        :param max_starts: int or None to run forever
+        :return: bool True if the bot stopped by itself
+
+        """
+        while max_starts is None or self.starts < max_starts:
+            self.starts += 1
+            if self.metrics:
+                self.metrics.inc('vk_supervisor_starts_total')
+            started_at = time.time()
+            bot = self.bot_factory()
+            try:
+                self.run_bot(bot)
+                return True
+            except Exception as e:
+                self.crashes += 1
+                if time.time() - started_at >= self.stable_after:
+                    self.consecutive_crashes = 0
+                self.consecutive_crashes += 1
+                self.last_crash_at = time.time()
+                self.last_error = repr(e)
+                if self.logger:
+                    self.logger.crash_log(e)
+                if self.metrics:
+                    self.metrics.inc('vk_supervisor_crashes_total')
+                    # the crashed bot may not have exported for a while
+                    self.metrics.export()
+            finally:
+                bot.close()
+                del bot
+
+            delay = self.get_delay()
+            if self.logger:
+                self.logger.log('restart in %.0f s, %s' % (delay, self.get_stat()), WARNING)
+            time.sleep(delay)
+        return False
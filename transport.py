@@ -0,0 +1,129 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+# seconds to connect and seconds between two reads of the answer
+DEFAULT_TIMEOUT = (5, 30)
+
+ERROR_CONNECT_TIMEOUT = 'connect_timeout'
+# no connection could be opened: refused, unreachable, unknown host
+ERROR_CONNECT = 'connect'
+# the connection was closed, reset or broken, maybe after the request was sent
+ERROR_ABORTED = 'aborted'
+ERROR_READ_TIMEOUT = 'read_timeout'
+ERROR_CONNECTION = 'connection'
+ERROR_SSL = 'ssl'
+ERROR_PROTOCOL = 'protocol'
+ERROR_RETRIES_EXHAUSTED = 'retries_exhausted'
+ERROR_REDIRECTS = 'redirects'
+ERROR_OTHER = 'other'
+
+# the hosts the bot talks to, each gets its own connection pool
+VK_HOSTS = ('vk.com', 'login.vk.com', 'api.vk.com')
+
+# the request cannot have reached vk.com, so sending it again is safe
+RESENDABLE_ERRORS = frozenset([ERROR_CONNECT_TIMEOUT, ERROR_CONNECT])
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that gives every request a timeout unless it has its own
+
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_retry(total=3, backoff_factor=0.5):
+    """
+    Retry policy of the bot's requests
+
+    Connection failures are retried for every method, since the request
+    was not sent yet. Read failures and 429/5xx answers are retried for
+    GET and HEAD only: a repeated POST could add a friend or publish a
+    post twice. Waits grow as backoff_factor * 2 ** n seconds, a
+    Retry-After header is respected.
+    :param total: int
+    :param backoff_factor: float
+    :return: Retry
+
+    """
+    return Retry(total=total, connect=total, read=total, status=total, backoff_factor=backoff_factor,
+                 status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']),
+                 raise_on_status=False, respect_retry_after_header=True)
+
+
+def create_session(hosts=len(VK_HOSTS), pool_size=1, timeout=DEFAULT_TIMEOUT, retry=None):
+    """
+    A session with kept-alive connections, retries and timeouts
+
+    The bot sends one request at a time, so one connection per host is
+    enough to reuse it for every request to that host.
+    :param hosts: int hosts a connection pool is kept for
+    :param pool_size: int connections kept per host
+    :param timeout: float or (connect, read) tuple
+    :param retry: Retry, create_retry() by default
+    :return: Session
+
+    """
+    session = requests.session()
+    adapter = TimeoutHTTPAdapter(timeout=timeout, pool_connections=hosts, pool_maxsize=pool_size,
+                                 max_retries=retry or create_retry())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['accept-encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def classify_error(e):
+    """
+    What kind of network failure an exception is
+    :param e: Exception raised by requests
+    :return: str one of the ERROR_* constants
+
+    """
+    reason = e.args[0] if e.args else None
+    if isinstance(reason, MaxRetryError):
+        # the retries ran out, what failed the last one counts
+        reason = reason.reason
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return ERROR_CONNECT_TIMEOUT
+    if isinstance(reason, ReadTimeoutError):
+        return ERROR_READ_TIMEOUT
+    if isinstance(e, requests.exceptions.Timeout):
+        return ERROR_READ_TIMEOUT
+    if isinstance(e, requests.exceptions.SSLError):
+        return ERROR_SSL
+    if isinstance(e, requests.exceptions.RetryError):
+        return ERROR_RETRIES_EXHAUSTED
+    if isinstance(e, requests.exceptions.TooManyRedirects):
+        return ERROR_REDIRECTS
+    if isinstance(e, (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)):
+        return ERROR_PROTOCOL
+    if isinstance(reason, NewConnectionError) or isinstance(e, ConnectionRefusedError):
+        return ERROR_CONNECT
+    if isinstance(reason, (ProtocolError, ConnectionResetError, ConnectionAbortedError, BrokenPipeError)) or \
+            isinstance(e, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)):
+        # 'Connection aborted.', RemoteDisconnected: vk.com may have got the whole request
+        return ERROR_ABORTED
+    if isinstance(e, (requests.exceptions.ConnectionError, ConnectionError)):
+        return ERROR_CONNECTION
+    return ERROR_OTHER
@@ -0,0 +1,155 @@
+import collections
+import re
+
+STATUS_CAPTCHA = 'captcha'
+STATUS_OK = 'ok'
+STATUS_UNKNOWN = 'unknown'
+
+MARKER_FRIEND_ADDED = 'у Вас в друзьях'
+MARKER_POST_SHARED = 'Запись отправлена'
+MARKER_SUBSCRIBED = 'Вы подписались'
+
+ActionResponse = collections.namedtuple('ActionResponse', ['status', 'captcha_key'])
+SearchPage = collections.namedtuple('SearchPage', ['people', 'offset', 'has_more'])
+
+_CAPTCHA_SEPARATOR = '<!>2<!>'
+_CAPTCHA_TAIL = '<!>2<!>ru'
+# a field of the login form vk.com puts on its pages for logged out visitors
+_LOGIN_FORM_MARKER = b'name="lg_h"'
+
+_admin_hash_re = re.compile(r"\\n    hash: '([^']+)',\\n")
+_friend_request_re = re.compile(
+    r'<button[^>]*accept_request_([0-9]+)[^>]*Friends\.acceptRequest\([0-9]+, \'([^>]*)\', this\)">Добавить в друзья</button>')
+_language_hash_re = re.compile(r"lang_id: 0, hash: '([^']+)'}")
+_search_button_re = re.compile(
+    r'<button id="search_sub([0-9]+)"[^>]*this, [0-9]+, \'([^>]*)\', true([^>]*)>Добавить в друзья</button>')
+_search_offset_re = re.compile(r'"offset":([0-9]+)')
+_share_hash_re = re.compile(r"shHash: '([^']+)'")
+_uid_re = re.compile(r'"uid":"([0-9]+)"')
+_vk_id_re = re.compile(r',\n  id: ([0-9]+)')
+
+
+def parse_action_response(text, success_marker):
+    """
+    Tell how an al_*.php action went
+    :param text: str response body
+    :param success_marker: str one of MARKER_* constants
+    :return: ActionResponse with STATUS_OK, STATUS_CAPTCHA (and the key
+        of the captcha to solve) or STATUS_UNKNOWN
+
+    """
+    if success_marker in text:
+        return ActionResponse(STATUS_OK, None)
+
+    end = text.rfind(_CAPTCHA_TAIL)
+    if end != -1:
+        start = text.rfind(_CAPTCHA_SEPARATOR, 0, end)
+        if start != -1:
+            captcha_key = text[start + len(_CAPTCHA_SEPARATOR):end]
+            if captcha_key and '\n' not in captcha_key:
+                return ActionResponse(STATUS_CAPTCHA, captcha_key)
+
+    return ActionResponse(STATUS_UNKNOWN, None)
+
+
+def find_admin_hash(text):
+    """
+    The hash of the write box on somebody's profile page
+    :param text: str
+    :return: str or None
+
+    """
+    return _search_group(_admin_hash_re, text)
+
+
+def find_friend_requests(text):
+    """
+    Income friendship requests listed on the friends?section=requests page
+    :param text: str
+    :return: list of (friend_id, friend_hash) tuples
+
+    """
+    if 'Friends.acceptRequest(' not in text:
+        return []
+    return _friend_request_re.findall(text)
+
+
+def find_language_hash(text):
+    """
+    The hash of the switch to Russian on the login page
+    :param text: str
+    :return: str or None
+
+    """
+    return _search_group(_language_hash_re, text)
+
+
+def find_share_hash(text):
+    """
+    The hash of the publish box returned by like.php?act=publish_box
+    :param text: str
+    :return: str or None
+
+    """
+    return _search_group(_share_hash_re, text)
+
+
+def find_uid(text):
+    """
+    The user id in the page opened right after the login
+    :param text: str
+    :return: str or None
+
+    """
+    return _search_group(_uid_re, text)
+
+
+def find_vk_id(text):
+    """
+    The id of the logged in user in the vk object of any page
+    :param text: str
+    :return: str or None
+
+    """
+    return _search_group(_vk_id_re, text)
+
+
+def is_login_page(content):
+    """
+    Tell a page shown to a logged out visitor, without parsing it
+    :param content: bytes response body
+    :return: bool
+
+    """
+    return _LOGIN_FORM_MARKER in content
+
+
+def parse_search_response(text):
+    """
+    Extract people who can be sent a friend request from al_search.php
+    :param text: str
+    :return: SearchPage, people is a list of (friend_id, friend_hash)
+
+    """
+    offset = None
+    has_more = False
+    if '"has_more":true' in text:
+        offset_match = _search_offset_re.search(text)
+        if offset_match:
+            offset = int(offset_match.group(1))
+            has_more = True
+
+    people = []
+    if 'search_sub' in text:
+        for friend_id, friend_hash, button_end in _search_button_re.findall(text):
+            if 'display: none;' not in button_end:
+                people.append((friend_id, friend_hash))
+
+    return SearchPage(people, offset, has_more)
+
+
+def _search_group(pattern, text):
+    match = pattern.search(text)
+    if match is None:
+        return None
+    return match.group(1)
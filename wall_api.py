@@ -0,0 +1,157 @@
+import collections
+import json
+import urllib.parse
+
+from post_record import PostRecord
+
+API_URL = 'https://api.vk.com/method/'
+API_VERSION = '5.131'
+EXECUTE_URL = API_URL + 'execute'
+# execute runs at most 25 API calls
+EXECUTE_MAX_CALLS = 25
+
+# group pages with an id instead of a short name, 'https://vk.com/club123'
+_GROUP_PREFIXES = ('club', 'public', 'event')
+
+WallBatch = collections.namedtuple('WallBatch', ['posts', 'errors'])
+
+
+def get_wall_params(url):
+    """
+    The wall.get arguments of a wall url
+    :param url: str 'https://vk.com/forbes', 'https://vk.com/id53083705' or 'https://vk.com/club30666517'
+    :return: dict with owner_id or domain
+
+    """
+    name = urllib.parse.urlsplit(url).path.strip('/')
+    if name.startswith('id') and name[2:].isdigit():
+        return {'owner_id': int(name[2:])}
+    for prefix in _GROUP_PREFIXES:
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            return {'owner_id': -int(name[len(prefix):])}
+    return {'domain': name}
+
+
+def post_from_item(item, owners):
+    """
+    Map a wall.get item to the record the HTML parser would give
+    :param item: dict
+    :param owners: dict of owner_id: (name, screen_name) from the profiles and groups of the answer
+    :return: PostRecord
+
+    """
+    result = PostRecord(owner_id=item['owner_id'], post_id=item['id'], date=item.get('date') or 0)
+    result.pinned = bool(item.get('is_pinned'))
+    result.author_name, result.author_link = _get_owner(owners, item['owner_id'])
+    copy_history = item.get('copy_history')
+    if copy_history:
+        original = copy_history[0]
+        result.original_key = (original['owner_id'], original['id'])
+        result.copy_author_name, result.copy_author_link = _get_owner(owners, original['owner_id'])
+    result.likes = (item.get('likes') or {}).get('count', 0)
+    result.reposts = (item.get('reposts') or {}).get('count', 0)
+    result.views = (item.get('views') or {}).get('count', 0)
+    if result.views:
+        result.rating = (result.likes + result.reposts) / result.views * 100
+    return result
+
+
+class WallApi:
+    """
+    Reads walls through the JSON API instead of their pages
+
+    Every wall is one wall.get call, up to EXECUTE_MAX_CALLS of them are
+    sent in one execute request, so a whole crawl is a single round trip
+    with no HTML to download and parse. The answers become the same
+    PostRecord objects _parse_wall_post gives; posts marked as ads are
+    left out. Only building the request and reading the answer are done
+    here, sending it is up to the caller.
+
+    """
+
+    def __init__(self, access_token, version=API_VERSION, count=20):
+        """
+        :param access_token: str
+        :param version: str API version the answers are read as
+        :param count: int posts read of every wall, 100 at most
+
+        """
+        self.access_token = access_token
+        self.version = version
+        self.count = count
+
+    def get_batches(self, urls):
+        """
+        :param urls: iterable of str
+        :return: list of lists of str, one execute request each
+
+        """
+        urls = list(urls)
+        return [urls[i:i + EXECUTE_MAX_CALLS] for i in range(0, len(urls), EXECUTE_MAX_CALLS)]
+
+    def get_execute_params(self, urls, count=None):
+        """
+        The form of an execute request reading the walls, to be POSTed so
+        the token stays out of the URL
+        :param urls: list of str, EXECUTE_MAX_CALLS at most
+        :param count: int posts of every wall, self.count by default
+        :return: dict
+
+        """
+        calls = []
+        for url in urls:
+            params = get_wall_params(url)
+            params.update({'count': count or self.count, 'extended': 1})
+            calls.append('API.wall.get(%s)' % json.dumps(params, separators=(',', ':')))
+        return {
+            'code': 'return [%s];' % ','.join(calls),
+            'access_token': self.access_token,
+            'v': self.version,
+        }
+
+    def scrub(self, text):
+        """
+        :param text: str
+        :return: str the text without the access token, for logging
+
+        """
+        if not self.access_token:
+            return text
+        return text.replace(self.access_token, '***')
+
+    def parse_execute_response(self, urls, data):
+        """
+        Read the answer of an execute request made by get_execute_params
+        :param urls: list of str the request was made for
+        :param data: dict decoded JSON answer
+        :return: WallBatch with a dict of url: list of PostRecord, the newest
+            first, for every wall that was read, and a list of str errors
+
+        """
+        if 'error' in data:
+            error = data['error']
+            return WallBatch({}, ['%s: %s' % (error.get('error_code'), error.get('error_msg'))])
+
+        errors = ['%s %s: %s' % (error.get('method'), error.get('error_code'), error.get('error_msg'))
+                  for error in data.get('execute_errors') or ()]
+        posts = {}
+        for url, answer in zip(urls, data.get('response') or ()):
+            if not answer:
+                # this wall.get failed, the reason is in execute_errors
+                continue
+            owners = {}
+            for profile in answer.get('profiles') or ():
+                name = '%s %s' % (profile.get('first_name', ''), profile.get('last_name', ''))
+                owners[profile['id']] = (name.strip(), profile.get('screen_name'))
+            for group in answer.get('groups') or ():
+                owners[-group['id']] = (group.get('name'), group.get('screen_name'))
+            posts[url] = [post_from_item(item, owners) for item in answer.get('items') or ()
+                          if not item.get('marked_as_ads')]
+        return WallBatch(posts, errors)
+
+
+def _get_owner(owners, owner_id):
+    name, screen_name = owners.get(owner_id, (None, None))
+    if not screen_name:
+        screen_name = ('id%d' % owner_id) if owner_id > 0 else ('club%d' % -owner_id)
+    return name, '/' + screen_name